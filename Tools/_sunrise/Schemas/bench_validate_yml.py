@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+# Бенчмарк построчной проверки переводов validate_yml.py на всём дереве Resources/Locale/ru-RU.
+# legacy - прежние функции: три re.sub без компиляции на каждую строку и перебор ignore_list через in,
+# current - функции validate_yml.py. Файлы читаются заранее, измеряется только проверка строк.
+# Заодно проверяется, что найденные ошибки совпадают.
+
+import argparse
+import os
+import re
+import sys
+import time
+
+import validate_yml
+
+
+def legacy_is_english(text):
+    return bool(re.search(r'[a-zA-Z]', text))
+
+def legacy_has_russian(text):
+    return bool(re.search(r'[а-яА-Я]', text))
+
+def legacy_remove_braces_content(text):
+    text1 = re.sub(r'\{.*?\}', '', text)
+    text2 = re.sub(r'\[.*?\]', '', text1)
+    text3 = re.sub(r'\<.*?\>', '', text2)
+    return text3
+
+def legacy_contains_ignored_word(text, ignore_list):
+    return any(ignored_word in text for ignored_word in ignore_list)
+
+
+def check_lines(files_lines, is_english, has_russian, remove_braces_content, contains_ignored_word, ignore):
+    errors = []
+    for rel_path, lines in files_lines:
+        for line_num, line in enumerate(lines, start=1):
+            if '=' in line and not line.strip().startswith('#'):
+                key, value = line.split('=', 1)
+                value = remove_braces_content(value.strip())
+                if not has_russian(value) and not contains_ignored_word(value, ignore) and is_english(value):
+                    errors.append((rel_path, line_num, key.strip()))
+    return errors
+
+
+def load_files_lines(locale_dir, ignore_files):
+    files_lines = []
+    for dirpath, _, filenames in os.walk(locale_dir):
+        for filename in sorted(filenames):
+            if filename.endswith('.ftl') and filename not in ignore_files:
+                file_path = os.path.join(dirpath, filename)
+                with open(file_path, 'r', encoding='utf-8') as ftl_file:
+                    files_lines.append((os.path.relpath(file_path, locale_dir), ftl_file.readlines()))
+    return files_lines
+
+
+def main():
+    base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..')
+    parser = argparse.ArgumentParser(description='Бенчмарк проверки переводов validate_yml.py')
+    parser.add_argument('--locale-dir', default=os.path.join(base_dir, 'Resources', 'Locale', 'ru-RU'), help='Каталог локали')
+    parser.add_argument('--ignore', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ignore_list.yml'),
+                        help='YAML-файл со списком слов и файлов для игнорирования')
+    parser.add_argument('--repeat', type=int, default=3, help='Количество повторов (берётся лучшее время)')
+
+    args = parser.parse_args()
+
+    ignore_list, ignore_files = validate_yml.load_ignore_list(args.ignore)
+    files_lines = load_files_lines(args.locale_dir, ignore_files)
+    print(f'Файлов: {len(files_lines)}, строк: {sum(len(lines) for _, lines in files_lines)}, '
+          f'игнорируемых слов: {len(ignore_list)}')
+
+    def measure(*functions_and_ignore):
+        best, errors = None, None
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            errors = check_lines(files_lines, *functions_and_ignore)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, errors
+
+    legacy_elapsed, legacy_errors = measure(legacy_is_english, legacy_has_russian, legacy_remove_braces_content,
+                                            legacy_contains_ignored_word, ignore_list)
+    elapsed, errors = measure(validate_yml.is_english, validate_yml.has_russian, validate_yml.remove_braces_content,
+                              validate_yml.contains_ignored_word, validate_yml.build_ignore_pattern(ignore_list))
+
+    print(f'{"legacy":>8}: {legacy_elapsed:7.2f} с')
+    print(f'{"current":>8}: {elapsed:7.2f} с  x{legacy_elapsed / elapsed:.1f}')
+
+    if errors != legacy_errors:
+        print('Результаты различаются!')
+        return 1
+    print(f'Результаты совпадают (ошибок: {len(errors)}).')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,14 +2,14 @@
 
 import os
 import re
+import subprocess
 import sys
 import yaml
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from glob import iglob
-from typing import List
-
-# Общий список ошибок
-errors: List["LocaleError"] = []
+from typing import List, Optional, Set
 
 class LocaleError:
     def __init__(self, path: str, line: int, message: str):
@@ -17,29 +17,94 @@ class LocaleError:
         self.line = line
         self.message = message
 
-def add_error(file_path: str, line: int, message: str):
-    errors.append(LocaleError(file_path, line, message))
+# Регулярные выражения компилируются один раз: проверки вызываются для каждой строки каждого файла
+ENGLISH_PATTERN = re.compile(r'[a-zA-Z]')
+RUSSIAN_PATTERN = re.compile(r'[а-яА-Я]')
+# Применяются по очереди, как раньше: объединение в одно выражение меняет результат для вложенных скобок
+BRACES_PATTERNS = [
+    ('{', re.compile(r'\{.*?\}')),
+    ('[', re.compile(r'\[.*?\]')),
+    ('<', re.compile(r'\<.*?\>')),
+]
+YML_KEY_PATTERN = re.compile(r'^(name|description|suffix|rules|desc):\s*(.+)')
 
 def is_english(text):
-    return bool(re.search(r'[a-zA-Z]', text))
+    return ENGLISH_PATTERN.search(text) is not None
 
 def has_russian(text):
-    return bool(re.search(r'[а-яА-Я]', text))
+    return RUSSIAN_PATTERN.search(text) is not None
 
 def remove_braces_content(text):
-    text1 = re.sub(r'\{.*?\}', '', text)
-    text2 = re.sub(r'\[.*?\]', '', text1)
-    text3 = re.sub(r'\<.*?\>', '', text2)
-    return text3
-
-def contains_ignored_word(text, ignore_list):
-    return any(ignored_word in text for ignored_word in ignore_list)
-
-def check_translations(root_dir, ignore_list, ignore_files):
+    for bracket, pattern in BRACES_PATTERNS:
+        if bracket in text:
+            text = pattern.sub('', text)
+    return text
+
+# Весь список игнорируемых слов - одно выражение-альтернатива: вхождение ищется за один проход по строке
+# вместо проверки каждого слова через in
+def build_ignore_pattern(ignore_list):
+    if not ignore_list:
+        return None
+    words = sorted(set(map(str, ignore_list)), key=len, reverse=True)
+    return re.compile('|'.join(map(re.escape, words)))
+
+def contains_ignored_word(text, ignore_pattern):
+    return ignore_pattern is not None and ignore_pattern.search(text) is not None
+
+# Файлы проверяются независимо: каждая проверка возвращает свои ошибки, а не дописывает их в общий список,
+# поэтому файлы можно раздать пулу процессов. Порядок файлов задаётся обходом каталога, и результаты
+# собираются в том же порядке, так что вывод не зависит от числа процессов
+def check_ftl_file(ignore_pattern, file_path: str, rel_path: str) -> List[LocaleError]:
+    errors = []
+    with open(file_path, 'r', encoding='utf-8') as ftl_file:
+        lines = ftl_file.readlines()
+        for line_num, line in enumerate(lines, start=1):
+            if '=' in line and not line.strip().startswith('#'):
+                key, value = line.split('=', 1)
+                key = key.strip()
+                value = value.strip()
+                value = remove_braces_content(value)
+
+                if not has_russian(value) and not contains_ignored_word(value, ignore_pattern):
+                    if key.endswith('.desc') or key.endswith('.suffix'):
+                        if is_english(value):
+                            errors.append(LocaleError(rel_path, line_num, f'Не переведённая строка "{key}": {line.strip()}'))
+                    elif is_english(value):
+                        errors.append(LocaleError(rel_path, line_num, f'Не переведённая строка "{key}": {line.strip()}'))
+    return errors
+
+def check_yml_file(yml_path: str) -> List[LocaleError]:
+    errors = []
+    with open(yml_path, 'r', encoding='utf-8') as file:
+        content = file.readlines()
+
+        for i, line in enumerate(content, start=1):
+            match = YML_KEY_PATTERN.match(line.strip())
+            if match:
+                key, value = match.groups()
+                if has_russian(value):
+                    errors.append(LocaleError(yml_path, i, f'Поле "{key}" содержит русские символы.'))
+    return errors
+
+def _check_ftl_file(ignore_pattern, paths):
+    return check_ftl_file(ignore_pattern, *paths)
+
+# jobs = 1 - проверка в текущем процессе, иначе в пуле процессов (None - все ядра)
+def run_checks(check, items, jobs) -> List[LocaleError]:
+    if jobs == 1 or len(items) <= 1:
+        results = map(check, items)
+        return [error for file_errors in results for error in file_errors]
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(check, items, chunksize=64)
+        return [error for file_errors in results for error in file_errors]
+
+# changed_files - абсолютные пути изменённых файлов; None - проверять все
+def check_translations(root_dir, ignore_pattern, ignore_files, jobs=1, changed_files: Optional[Set[str]] = None) -> List[LocaleError]:
     ru_locale_dir = f'{root_dir}ru-RU/'
-    en_locale_dir = f'{root_dir}en-US/'
     root_dir_abs = os.path.abspath(ru_locale_dir)
 
+    files = []
     for dirpath, _, filenames in os.walk(ru_locale_dir):
         for filename in filenames:
             if filename.endswith('.ftl'):
@@ -50,22 +115,13 @@ def check_translations(root_dir, ignore_list, ignore_files):
                     #print(f'Игнорирование файла: {filename}') Не нужно, если много файлов игнорирует
                     continue
 
-                with open(file_path, 'r', encoding='utf-8') as ftl_file:
-                    lines = ftl_file.readlines()
-                    for line_num, line in enumerate(lines, start=1):
-                        if '=' in line and not line.strip().startswith('#'):
-                            key, value = line.split('=', 1)
-                            key = key.strip()
-                            value = value.strip()
-                            value = remove_braces_content(value)
-
-                            if not has_russian(value) and not contains_ignored_word(value, ignore_list):
-                                if key.endswith('.desc') or key.endswith('.suffix'):
-                                    if is_english(value):
-                                        add_error(rel_path, line_num, f'Не переведённая строка "{key}": {line.strip()}')
-                                elif is_english(value):
-                                    add_error(rel_path, line_num, f'Не переведённая строка "{key}": {line.strip()}')
-                                    
+                if changed_files is not None and os.path.abspath(file_path) not in changed_files:
+                    continue
+
+                files.append((file_path, rel_path))
+
+    return run_checks(partial(_check_ftl_file, ignore_pattern), files, jobs)
+
     #for dirpath, _, filenames in os.walk(en_locale_dir):
     #    for filename in filenames:
     #        if filename.endswith('.ftl'):
@@ -85,27 +141,29 @@ def check_translations(root_dir, ignore_list, ignore_files):
     #                        value = value.strip()
     #                        value = remove_braces_content(value)
 
-    #                        if not is_english(value) and not contains_ignored_word(value, ignore_list):
+    #                        if not is_english(value) and not contains_ignored_word(value, ignore_pattern):
     #                            if key.endswith('.desc') or key.endswith('.suffix'):
     #                                if has_russian(value):
     #                                    add_error(rel_path, line_num, f'Русская строка "{key}": {line.strip()}')
     #                            elif has_russian(value):
     #                                add_error(rel_path, line_num, f'Русская строка "{key}": {line.strip()}')
 
-def check_yml_files(dir: str, ignore_list: List[str]):
-    key_pattern = re.compile(r'^(name|description|suffix|rules|desc):\s*(.+)')
-    
+def check_yml_files(dir: str, jobs=1, changed_files: Optional[Set[str]] = None) -> List[LocaleError]:
+    files = []
     for yml_rel in iglob("**/*.yml", root_dir=dir, recursive=True):
         yml_path = os.path.join(dir, yml_rel)
-        with open(yml_path, 'r', encoding='utf-8') as file:
-            content = file.readlines()
-            
-            for i, line in enumerate(content, start=1):
-                match = key_pattern.match(line.strip())
-                if match:
-                    key, value = match.groups()
-                    if has_russian(value):
-                        add_error(yml_path, i, f'Поле "{key}" содержит русские символы.')
+        if changed_files is None or os.path.abspath(yml_path) in changed_files:
+            files.append(yml_path)
+
+    return run_checks(check_yml_file, files, jobs)
+
+# Файлы, изменённые относительно точки ответвления от ref (коммиты и незакоммиченные изменения), удалённые не входят
+def get_changed_files(ref: str) -> Set[str]:
+    top_level = subprocess.run(['git', 'rev-parse', '--show-toplevel'], capture_output=True, text=True, check=True).stdout.strip()
+    merge_base = subprocess.run(['git', 'merge-base', ref, 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    diff = subprocess.run(['git', 'diff', '--name-only', '--diff-filter=d', merge_base],
+                          capture_output=True, text=True, check=True, cwd=top_level).stdout
+    return {os.path.abspath(os.path.join(top_level, path)) for path in diff.splitlines() if path}
 
 def load_ignore_list(ignore_file):
     with open(ignore_file, 'r', encoding='utf-8') as f:
@@ -117,14 +175,25 @@ if __name__ == "__main__":
     parser.add_argument("localization_dir", help="Каталог с локализационными файлами")
     parser.add_argument("yml_dir", help="Каталог с YML файлами")
     parser.add_argument("--ignore", help="YAML-файл со списком слов и файлов для игнорирования", required=True)
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="Количество процессов (по умолчанию - все ядра, 1 - без пула)")
+    parser.add_argument("--changed-since", metavar="REF", help="Проверять только файлы, изменённые относительно REF (например origin/master)")
 
     args = parser.parse_args()
 
     ignore_list, ignore_files = load_ignore_list(args.ignore)
 
-    check_translations(args.localization_dir, ignore_list, ignore_files)
+    changed_files = None
+    if args.changed_since:
+        changed_files = get_changed_files(args.changed_since)
+        # Изменённый список игнорирования влияет на все файлы
+        if os.path.abspath(args.ignore) in changed_files:
+            changed_files = None
+        else:
+            print(f"Проверяются файлы, изменённые относительно {args.changed_since}: {len(changed_files)}")
+
+    errors = check_translations(args.localization_dir, build_ignore_pattern(ignore_list), ignore_files, args.jobs, changed_files)
 
-    check_yml_files(args.yml_dir, ignore_list)
+    errors += check_yml_files(args.yml_dir, args.jobs, changed_files)
 
     if errors:
         for error in errors:
@@ -132,4 +201,4 @@ if __name__ == "__main__":
         sys.exit(1)
     else:
         print("Ошибок не найдено.")
-        sys.exit(0)
\ No newline at end of file
+        sys.exit(0)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+# Бенчмарк FluentAstComparer на самых больших парах en-US/ru-RU.
+# legacy - прежняя реализация через py_.intersection_with / py_.difference_with с попарным BaseNode.equals,
+# fingerprints - текущая реализация на отпечатках. Заодно проверяется, что результаты всех методов совпадают.
+
+import argparse
+import os
+import sys
+import time
+
+from fluent.syntax import FluentParser
+from pydash import py_
+
+from fluentastcomparer import FluentAstComparer
+from project import Project
+
+METHODS = [
+    'get_equal_elements',
+    'get_not_equal_elements',
+    'get_equal_id_names',
+    'get_not_equal_id_names',
+    'get_not_exist_id_names',
+    'get_equal_values_with_attrs',
+    'get_not_equal_values_with_attrs',
+    'get_not_equal_exist_values_with_attrs',
+    'get_target_not_equal_values_with_attrs',
+    'get_target_not_equal_exist_values_with_attrs',
+]
+
+
+class LegacyFluentAstComparer(FluentAstComparer):
+    def intersection(self, elements, others, ignored_fields):
+        comparator = lambda a, b: a.element.equals(b.element, ignored_fields=list(ignored_fields))
+        return py_.intersection_with(elements, others, comparator=comparator)
+
+    def difference(self, elements, others, ignored_fields):
+        comparator = lambda a, b: a.element.equals(b.element, ignored_fields=list(ignored_fields))
+        return py_.difference_with(elements, others, comparator=comparator)
+
+
+def get_largest_pairs(project: Project):
+    pairs = []
+    for en_path in project.get_files_paths_by_dir(project.en_locale_dir_path, 'ftl'):
+        ru_path = os.path.join(project.ru_locale_dir_path, os.path.relpath(en_path, project.en_locale_dir_path))
+        if os.path.isfile(ru_path):
+            pairs.append((os.path.getsize(en_path) + os.path.getsize(ru_path), en_path, ru_path))
+    return [(en_path, ru_path) for _, en_path, ru_path in sorted(pairs, reverse=True)]
+
+
+def run_methods(comparer_class, parsed_pairs):
+    started = time.perf_counter()
+    results = []
+    for en_parsed, ru_parsed in parsed_pairs:
+        comparer = comparer_class(en_parsed, ru_parsed)
+        results.append([[element.get_id_name() for element in getattr(comparer, method)()] for method in METHODS])
+    return time.perf_counter() - started, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк FluentAstComparer на самых больших парах файлов')
+    parser.add_argument('--pairs', type=int, default=10, help='Количество пар файлов')
+    # Прежняя реализация квадратична: на наборах имён (datasets/names, ~3000 сообщений) она работает десятки минут
+    parser.add_argument('--max-messages', type=int, default=1000, help='Пропускать файлы, где сообщений больше')
+
+    args = parser.parse_args()
+
+    project = Project()
+    fluent_parser = FluentParser()
+    parsed_pairs = []
+    for en_path, ru_path in get_largest_pairs(project):
+        if len(parsed_pairs) >= args.pairs:
+            break
+        with open(en_path, 'r', encoding='utf-8-sig') as en_file, open(ru_path, 'r', encoding='utf-8-sig') as ru_file:
+            en_parsed, ru_parsed = fluent_parser.parse(en_file.read()), fluent_parser.parse(ru_file.read())
+        if max(len(en_parsed.body), len(ru_parsed.body)) <= args.max_messages:
+            parsed_pairs.append((en_parsed, ru_parsed))
+
+    messages = sum(len(en.body) + len(ru.body) for en, ru in parsed_pairs)
+    print(f'Пар файлов: {len(parsed_pairs)}, сообщений: {messages}')
+
+    legacy_elapsed, legacy_results = run_methods(LegacyFluentAstComparer, parsed_pairs)
+    elapsed, results = run_methods(FluentAstComparer, parsed_pairs)
+
+    print(f'{"legacy":>14}: {legacy_elapsed:7.2f} с')
+    print(f'{"fingerprints":>14}: {elapsed:7.2f} с  x{legacy_elapsed / elapsed:.1f}')
+
+    if results != legacy_results:
+        print('Результаты различаются!')
+        return 1
+    print('Результаты совпадают.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
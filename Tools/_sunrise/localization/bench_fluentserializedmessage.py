@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+# Бенчмарк генерации .ftl из прототипов сущностей на всём дереве Resources/Prototypes.
+# legacy - прежний путь yamlextractor: текст каждого сообщения (FluentSerializedMessage.from_yaml_element), склейка,
+# разбор и сериализация форматтером, повторный разбор результата;
+# ast - сообщения строятся сразу узлами AST (FluentSerializedMessage.to_ast_entries) и сериализуются один раз.
+# Заодно проверяется, что отформатированный текст каждого файла совпадает.
+
+import argparse
+import sys
+import time
+
+from fluent.syntax import ast, FluentParser
+
+from file import YAMLFile
+from fluentast import FluentSerializedMessage, FluentAstAttributeFactory
+from fluentformatter import FluentFormatter
+from project import Project
+
+
+def load_yaml_elements(project: Project):
+    files_elements = []
+    for yaml_file_path in sorted(project.get_files_paths_by_dir(project.prototypes_dir_path, 'yml')):
+        yaml_file = YAMLFile(yaml_file_path)
+        elements = yaml_file.get_elements(yaml_file.parse_data(yaml_file.read_data()))
+        for el in elements:
+            if isinstance(el.parent_id, list):
+                el.parent_id = el.parent_id[0]
+        if elements:
+            files_elements.append((yaml_file_path, elements))
+    return files_elements
+
+
+def run_legacy(files_elements):
+    parser = FluentParser()
+    started = time.perf_counter()
+    results = {}
+    for yaml_file_path, elements in files_elements:
+        messages = [FluentSerializedMessage.from_yaml_element(el.id, el.name, FluentAstAttributeFactory.from_yaml_element(el), el.parent_id)
+                    for el in elements]
+        messages = [message for message in messages if message]
+        if not messages:
+            continue
+        pretty = FluentFormatter.format_serialized_file_data('\n'.join(messages))
+        parser.parse(pretty)
+        results[yaml_file_path] = pretty
+    return time.perf_counter() - started, results
+
+
+def run_ast(files_elements):
+    parser = FluentParser()
+    started = time.perf_counter()
+    results = {}
+    for yaml_file_path, elements in files_elements:
+        entries = []
+        for el in elements:
+            entries.extend(FluentSerializedMessage.to_ast_entries(el.id, el.name, FluentAstAttributeFactory.from_yaml_element(el), el.parent_id))
+        if not entries:
+            continue
+        serialized = FluentFormatter.serialize(ast.Resource(body=entries))
+        pretty = FluentFormatter.join_markup_lines(serialized)
+        if pretty != serialized:
+            parser.parse(pretty)
+        results[yaml_file_path] = pretty
+    return time.perf_counter() - started, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк генерации .ftl из прототипов сущностей')
+    parser.add_argument('--repeat', type=int, default=1, help='Количество повторов (берётся лучшее время)')
+
+    args = parser.parse_args()
+
+    files_elements = load_yaml_elements(Project())
+    elements_count = sum(len(elements) for _, elements in files_elements)
+    print(f'Файлов: {len(files_elements)}, сущностей: {elements_count}')
+
+    legacy_elapsed, legacy_results = min((run_legacy(files_elements) for _ in range(args.repeat)), key=lambda r: r[0])
+    elapsed, results = min((run_ast(files_elements) for _ in range(args.repeat)), key=lambda r: r[0])
+
+    print(f'{"legacy":>8}: {legacy_elapsed:7.2f} с')
+    print(f'{"ast":>8}: {elapsed:7.2f} с  x{legacy_elapsed / elapsed:.1f}')
+
+    different = [path for path in legacy_results if legacy_results[path] != results.get(path)]
+    different += [path for path in results if path not in legacy_results]
+    if different:
+        for path in different[:10]:
+            print(f'Различается: {path}')
+        print(f'Результаты различаются в {len(different)} файлах!')
+        return 1
+    print('Результаты совпадают.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,12 @@
 import typing
+import os
+import sys
+
+# Общий загрузчик YAML (protoloader) лежит в соседнем каталоге prototypes
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'prototypes'))
 
 from fluent.syntax import ast
 from yamlmodels import YAMLElements
-import os
 
 
 class File:
@@ -10,9 +14,12 @@ class File:
         self.full_path = full_path
 
     def read_data(self):
-        file = open(self.full_path, 'r', encoding='utf8')
         # replace необходим для того, чтобы 1-е сообщение не считалось ast.Junk
-        file_data = file.read().replace('﻿', '')
+        return self.read_raw_data().replace('﻿', '')
+
+    def read_raw_data(self):
+        file = open(self.full_path, 'r', encoding='utf8')
+        file_data = file.read()
         file.close()
 
         return file_data
@@ -61,6 +68,46 @@ class FluentFile(File):
         return self.parse_data(self.read_data())
 
 
+# Разобранные .ftl на время одного запуска: каждый файл читается и разбирается один раз, изменения вносятся в AST,
+# а flush записывает каждый изменённый файл один раз в конце
+class FluentFileCache:
+    def __init__(self, parser):
+        self.parser = parser
+        self.resources: typing.Dict[str, ast.Resource] = {}
+        self.original_data: typing.Dict[str, str] = {}
+        self.dirty: typing.Set[str] = set()
+
+    def get(self, full_path) -> typing.Optional[ast.Resource]:
+        full_path = os.path.normpath(full_path)
+        if full_path not in self.resources:
+            if not os.path.isfile(full_path):
+                return None
+            data = FluentFile(full_path).read_data()
+            self.original_data[full_path] = data
+            self.resources[full_path] = self.parser.parse(data)
+        return self.resources[full_path]
+
+    def set(self, full_path, resource: ast.Resource):
+        full_path = os.path.normpath(full_path)
+        self.resources[full_path] = resource
+        self.dirty.add(full_path)
+
+    def mark_dirty(self, full_path):
+        self.dirty.add(os.path.normpath(full_path))
+
+    # Возвращает пути записанных файлов; файлы, содержимое которых не изменилось, не перезаписываются
+    def flush(self, serializer) -> typing.List[str]:
+        written = []
+        for full_path in sorted(self.dirty):
+            data = serializer.serialize(self.resources[full_path])
+            if self.original_data.get(full_path) != data:
+                FluentFile(full_path).save_data(data)
+                self.original_data[full_path] = data
+                written.append(full_path)
+        self.dirty.clear()
+        return written
+
+
 class YAMLFluentFileAdapter(File):
     def __init__(self, full_path):
         super().__init__(full_path)
@@ -75,9 +122,9 @@ class YAMLFile(File):
         super().__init__(full_path)
 
     def parse_data(self, file_data: typing.AnyStr):
-        import yaml
+        from protoloader import load
 
-        return yaml.load(file_data, Loader=yaml.BaseLoader)
+        return load(file_data)
 
     def get_elements(self, parsed_data):
 
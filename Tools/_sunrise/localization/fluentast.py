@@ -1,53 +1,59 @@
+import re
 import typing
 
 from fluent.syntax import ast, FluentParser, FluentSerializer
 from pydash import py_
 
+# Идентификатор сообщения/атрибута Fluent
+IDENTIFIER_PATTERN = re.compile(r'[a-zA-Z][\w-]*')
+# Текст, который можно положить в TextElement без разбора: одна строка без подстановок и экранирования, без пробелов
+# по краям (парсер их обрезает) и без символов, которые в начале значения парсер или форматтер трактуют особо
+PLAIN_TEXT_PATTERN = re.compile(r'[^\s{}\\\[*.][^{}\\\n\r]*(?<=\S)')
+
 
 class FluentAstAbstract:
-    element = None
-    @classmethod
-    def get_id_name(cls, element):
-        if isinstance(element, ast.Junk):
-            return FluentAstJunk(element).get_id_name()
-        elif isinstance(element, ast.Message):
-            return FluentAstMessage(element).get_id_name()
-        elif isinstance(element, ast.Term):
-            return FluentAstTerm(element).get_id_name()
-        else:
-            return None
+    @staticmethod
+    def get_id_name(element):
+        element_type = ELEMENT_TYPES.get(type(element))
+        return element_type.read_id_name(element) if element_type else None
+
+    # Обёртка без состояния класса: каждый вызов возвращает новый объект, поэтому безопасен из разных потоков
+    @staticmethod
+    def create_element(element):
+        element_type = ELEMENT_TYPES.get(type(element))
+        return element_type(element) if element_type else None
 
-    @classmethod
-    def create_element(cls, element):
-        if isinstance(element, ast.Junk):
-            cls.element = FluentAstJunk(element)
-            return cls.element
-        elif isinstance(element, ast.Message):
-            cls.element = FluentAstMessage(element)
-            return cls.element
-        elif isinstance(element, ast.Term):
-            cls.element = FluentAstTerm(element)
-            return cls.element
-        else:
-            return None
 
+# Обёртки создаются для каждой записи каждого файла, поэтому хранятся в __slots__, а id вычисляется один раз
+class FluentAstElement:
+    __slots__ = ('element', 'id_name')
 
-class FluentAstMessage:
-    def __init__(self, message: ast.Message):
-        self.message = message
-        self.element = message
+    def __init__(self, element):
+        self.element = element
+        self.id_name = self.read_id_name(element)
 
     def get_id_name(self):
-        return self.message.id.name
+        return self.id_name
 
+    @staticmethod
+    def read_id_name(element):
+        return element.id.name
 
-class FluentAstTerm:
-    def __init__(self, term: ast.Term):
-        self.term = term
-        self.element = term
 
-    def get_id_name(self):
-        return self.term.id.name
+class FluentAstMessage(FluentAstElement):
+    __slots__ = ()
+
+    @property
+    def message(self) -> ast.Message:
+        return self.element
+
+
+class FluentAstTerm(FluentAstElement):
+    __slots__ = ()
+
+    @property
+    def term(self) -> ast.Term:
+        return self.element
 
 
 class FluentAstAttribute:
@@ -73,13 +79,16 @@ class FluentAstAttributeFactory:
         return attrs
 
 
-class FluentAstJunk:
-    def __init__(self, junk: ast.Junk):
-        self.junk = junk
-        self.element = junk
+class FluentAstJunk(FluentAstElement):
+    __slots__ = ()
 
-    def get_id_name(self):
-        return self.junk.content.split('=')[0].strip()
+    @property
+    def junk(self) -> ast.Junk:
+        return self.element
+
+    @staticmethod
+    def read_id_name(element):
+        return element.content.split('=')[0].strip()
 
 
 class FluentSerializedMessage:
@@ -92,10 +101,7 @@ class FluentSerializedMessage:
             attributes = []
 
         if len(list(filter(lambda attr: attr.id == 'desc', attributes))) == 0:
-            if parent_id:
-                attributes.append(FluentAstAttribute('desc', '{ ' + FluentSerializedMessage.get_key(parent_id) + '.desc' + ' }'));
-            else:
-                attributes.append(FluentAstAttribute('desc', '{ "" }'))
+            attributes.append(FluentAstAttribute('desc', cls.get_desc_placeholder(parent_id)))
 
         message = f'{cls.get_key(id, raw_key)} = {cls.get_value(value, parent_id)}\n'
 
@@ -127,11 +133,67 @@ class FluentSerializedMessage:
         if not string_message:
             return None
 
-        ast_message = FluentParser().parse(string_message)
-        serialized = FluentSerializer(with_junk=True).serialize(ast_message)
+        ast_message = parser.parse(string_message)
+        serialized = serializer.serialize(ast_message)
 
         return serialized if serialized else ''
 
+    # То же сообщение, что и from_yaml_element, но сразу в виде узлов AST: файл собирается из них и сериализуется
+    # один раз, без промежуточного текста. Значения, которые нельзя построить без разбора (многострочные, с
+    # подстановками, с разметкой в начале), разбираются вместе с сообщением - результат тот же, что у текста.
+    # Возвращает список записей (сообщение или Junk, если текст сообщения некорректен)
+    @classmethod
+    def to_ast_entries(cls, id, value, attributes, parent_id = None, raw_key = False) -> typing.List[ast.Entry]:
+        if not value and not id and not parent_id:
+            return []
+
+        attributes = list(attributes or [])
+        if not py_.find(attributes, lambda attr: attr.id == 'desc'):
+            attributes.append(FluentAstAttribute('desc', cls.get_desc_placeholder(parent_id)))
+
+        key = cls.get_key(id, raw_key)
+        if raw_key or not IDENTIFIER_PATTERN.fullmatch(key):
+            return cls.parse_entries(id, value, attributes, parent_id, raw_key)
+
+        pattern = cls.get_pattern(cls.get_value(value, parent_id))
+        attr_patterns = [cls.get_pattern(attr.value) for attr in attributes]
+        if pattern is None or any(attr_pattern is None for attr_pattern in attr_patterns) \
+                or not all(IDENTIFIER_PATTERN.fullmatch(attr.id) for attr in attributes):
+            return cls.parse_entries(id, value, attributes, parent_id, raw_key)
+
+        ast_attributes = [ast.Attribute(ast.Identifier(attr.id), attr_pattern)
+                          for attr, attr_pattern in zip(attributes, attr_patterns)]
+        return [ast.Message(ast.Identifier(key), pattern, ast_attributes)]
+
+    @classmethod
+    def parse_entries(cls, id, value, attributes, parent_id, raw_key):
+        return parser.parse(cls.from_yaml_element(id, value, attributes, parent_id, raw_key)).body
+
+    # Значения, которые генерирует from_yaml_element ({ "" }, { ent-parent }, { ent-parent.desc }), и простой текст.
+    # None - значение нужно разбирать парсером
+    @staticmethod
+    def get_pattern(value) -> typing.Optional[ast.Pattern]:
+        if value == '{ "" }':
+            return ast.Pattern([ast.Placeable(ast.StringLiteral(''))])
+
+        if value.startswith('{ ') and value.endswith(' }'):
+            reference = value[2:-2].split('.')
+            if len(reference) <= 2 and all(IDENTIFIER_PATTERN.fullmatch(part) for part in reference):
+                attribute = ast.Identifier(reference[1]) if len(reference) == 2 else None
+                return ast.Pattern([ast.Placeable(ast.MessageReference(ast.Identifier(reference[0]), attribute))])
+            return None
+
+        if PLAIN_TEXT_PATTERN.fullmatch(value):
+            return ast.Pattern([ast.TextElement(value)])
+
+        return None
+
+    @staticmethod
+    def get_desc_placeholder(parent_id):
+        if parent_id:
+            return '{ ' + FluentSerializedMessage.get_key(parent_id) + '.desc' + ' }'
+        return '{ "" }'
+
     @staticmethod
     def add_attr(message_str, attr_key, attr_value, raw_key = False):
         prefix = '' if raw_key else '.'
@@ -152,3 +214,13 @@ class FluentSerializedMessage:
             return f'{id}'
         else:
             return f'ent-{id}'
+
+
+ELEMENT_TYPES = {
+    ast.Message: FluentAstMessage,
+    ast.Term: FluentAstTerm,
+    ast.Junk: FluentAstJunk,
+}
+
+parser = FluentParser()
+serializer = FluentSerializer(with_junk=True)
@@ -1,7 +1,26 @@
+import typing
+
 from fluent.syntax import ast
 from fluentast import FluentAstAbstract
 from pydash import py_
 
+# Наборы игнорируемых полей, с которыми сравниваются сообщения (как в BaseNode.equals, поля игнорируются на всех уровнях)
+FULL_IGNORED_FIELDS = frozenset(['span'])
+ID_NAME_IGNORED_FIELDS = frozenset(['span', 'value', 'comment', 'attributes'])
+VALUE_WITH_ATTRS_IGNORED_FIELDS = frozenset(['span', 'id', 'comment'])
+
+
+# Структурный отпечаток узла: два узла равны по BaseNode.equals(ignored_fields) тогда и только тогда, когда равны их
+# отпечатки. Тип сравнивается только у вложенных узлов - как и в equals, где тип проверяет scalars_equal
+def get_fingerprint(value, ignored_fields, nested=False):
+    if isinstance(value, ast.BaseNode):
+        fields = tuple(sorted((key, get_fingerprint(field, ignored_fields, True))
+                              for key, field in vars(value).items() if key not in ignored_fields))
+        return (type(value).__name__ if nested else None, fields)
+    if isinstance(value, list):
+        return ('list', tuple(get_fingerprint(item, ignored_fields, True) for item in value))
+    return (type(value).__name__, value)
+
 
 class FluentAstComparer:
     def __init__(self, sourse_parsed: ast.Resource, target_parsed: ast.Resource):
@@ -11,90 +30,86 @@ class FluentAstComparer:
             filter(lambda el: el, list(map(lambda e: FluentAstAbstract.create_element(e), sourse_parsed.body))))
         self.target_elements = list(
             filter(lambda el: el, list(map(lambda e: FluentAstAbstract.create_element(e), target_parsed.body))))
+        # Отпечатки считаются один раз на элемент и набор полей, дальше все запросы - операции над множествами.
+        # Ключ - id элемента, поэтому сам элемент хранится рядом с отпечатком, чтобы id не переиспользовался
+        self.fingerprints: typing.Dict[typing.Tuple[int, frozenset], typing.Tuple[typing.Any, typing.Hashable]] = {}
+        self.fingerprint_sets: typing.Dict[typing.Tuple[str, frozenset], typing.Set[typing.Hashable]] = {}
+
+    def get_element_fingerprint(self, element, ignored_fields):
+        key = (id(element), ignored_fields)
+        cached = self.fingerprints.get(key)
+        if cached is None:
+            cached = self.fingerprints[key] = (element, get_fingerprint(element.element, ignored_fields))
+        return cached[1]
+
+    def get_fingerprint_set(self, elements, ignored_fields):
+        fingerprint_set = lambda: {self.get_element_fingerprint(element, ignored_fields) for element in elements}
+        if elements is self.source_elements:
+            key = ('source', ignored_fields)
+        elif elements is self.target_elements:
+            key = ('target', ignored_fields)
+        else:
+            return fingerprint_set()
+
+        if key not in self.fingerprint_sets:
+            self.fingerprint_sets[key] = fingerprint_set()
+        return self.fingerprint_sets[key]
+
+    # Элементы elements, для которых в others есть равный (порядок и сами объекты берутся из elements)
+    def intersection(self, elements, others, ignored_fields):
+        other_fingerprints = self.get_fingerprint_set(others, ignored_fields)
+        return [element for element in elements if self.get_element_fingerprint(element, ignored_fields) in other_fingerprints]
+
+    # Элементы elements, для которых в others нет равного
+    def difference(self, elements, others, ignored_fields):
+        other_fingerprints = self.get_fingerprint_set(others, ignored_fields)
+        return [element for element in elements if self.get_element_fingerprint(element, ignored_fields) not in other_fingerprints]
 
     # Возвращает полностью эквивалентные сообщения (не считая span)
     def get_equal_elements(self):
-        comparator = lambda a, b: a.element.equals(b.element, ignored_fields=['span'])
-
-        return py_.intersection_with(self.source_elements, self.target_elements, comparator=comparator)
+        return self.intersection(self.source_elements, self.target_elements, FULL_IGNORED_FIELDS)
 
     # Возвращает полностью неэквивалентные сообщения (не считая span)
     def get_not_equal_elements(self):
-        comparator = lambda a, b: a.element.equals(b.element, ignored_fields=['span'])
-        diff = py_.difference_with(self.source_elements, self.target_elements, comparator=comparator)
-
-        return diff
+        return self.difference(self.source_elements, self.target_elements, FULL_IGNORED_FIELDS)
 
     # Возвращает сообщения с эквивалентными именами ключей
     def get_equal_id_names(self):
-        comparator = lambda a, b: a.element.equals(b.element, ignored_fields=['span', 'value', 'comment', 'attributes'])
-        eq = py_.intersection_with(self.source_elements, self.target_elements, comparator=comparator)
-
-        return eq
+        return self.intersection(self.source_elements, self.target_elements, ID_NAME_IGNORED_FIELDS)
 
     # Возвращает сообщения с неэквивалентными именами ключей
     def get_not_equal_id_names(self):
-        comparator = lambda a, b: a.element.equals(b.element, ignored_fields=['span', 'value', 'comment', 'attributes'])
-        diff = py_.difference_with(self.source_elements, self.target_elements, comparator=comparator)
-
-        return diff
+        return self.difference(self.source_elements, self.target_elements, ID_NAME_IGNORED_FIELDS)
 
     # Возвращает сообщения target, существующие в source
     def get_exist_id_names(self, source, target):
-        comparator = lambda a, b: a.element.equals(b.element, ignored_fields=['span', 'value', 'comment', 'attributes'])
-        eq = py_.intersection_with(source, target, comparator=comparator)
-
-        return eq
+        return self.intersection(source, target, ID_NAME_IGNORED_FIELDS)
 
     # Возвращает сообщения target, существующие в source
     def get_not_exist_id_names(self):
-        comparator = lambda a, b: a.element.equals(b.element, ignored_fields=['span', 'value', 'comment', 'attributes'])
-        diff = py_.difference_with(self.target_elements, self.source_elements, comparator=comparator)
-
-        return diff
+        return self.difference(self.target_elements, self.source_elements, ID_NAME_IGNORED_FIELDS)
 
     # Возвращает сообщения с эквивалентным значением и атрибутами
     def get_equal_values_with_attrs(self):
-        comparator = lambda a, b: a.element.equals(b.element, ignored_fields=['span', 'id', 'comment'])
-        eq = py_.intersection_with(self.target_elements, self.source_elements, comparator=comparator)
-
-        return eq
+        return self.intersection(self.target_elements, self.source_elements, VALUE_WITH_ATTRS_IGNORED_FIELDS)
 
     # Возвращает сообщения из source с неэквивалентным значением и атрибутами
     def get_not_equal_values_with_attrs(self):
-        comparator = lambda a, b: a.element.equals(b.element, ignored_fields=['span', 'id', 'comment'])
-        diff = py_.difference_with(self.source_elements, self.target_elements,
-                                   comparator=lambda a, b: a.element.equals(b.element,
-                                                                            ignored_fields=['span', 'id', 'comment']))
-
-        return diff
+        return self.difference(self.source_elements, self.target_elements, VALUE_WITH_ATTRS_IGNORED_FIELDS)
 
     # Возвращает сообщения из source, существующие в target и source, с неэквивалентным значением и атрибутами
     def get_not_equal_exist_values_with_attrs(self):
-        diff = py_.difference_with(self.source_elements, self.target_elements,
-                                   comparator=lambda a, b: a.element.equals(b.element,
-                                                                            ignored_fields=['span', 'id', 'comment']))
-        ex = self.get_exist_id_names(self.source_elements, self.target_elements)
-        exist = py_.intersection(diff, ex)
-
-        return exist
-
-        # Возвращает сообщения из target с неэквивалентным значением и атрибутами
+        diff = self.difference(self.source_elements, self.target_elements, VALUE_WITH_ATTRS_IGNORED_FIELDS)
+        return self.intersection(diff, self.target_elements, ID_NAME_IGNORED_FIELDS)
 
+    # Возвращает сообщения из target с неэквивалентным значением и атрибутами
     def get_target_not_equal_values_with_attrs(self):
-        comparator = lambda a, b: a.element.equals(b.element, ignored_fields=['span', 'id', 'comment'])
-        diff = py_.difference_with(self.source_elements, self.target_elements, comparator=comparator)
-
-        return diff
+        return self.difference(self.source_elements, self.target_elements, VALUE_WITH_ATTRS_IGNORED_FIELDS)
 
     # Возвращает сообщения, существующие в target и source, с неэквивалентным значением и атрибутами
     def get_target_not_equal_exist_values_with_attrs(self):
-        diff = py_.difference_with(self.target_elements, self.source_elements,
-                                   comparator=lambda a, b: a.element.equals(b.element,
-                                                                            ignored_fields=['span', 'id', 'comment']))
-        exist = py_.intersection(diff, self.get_exist_id_names(self.target_elements, self.source_elements))
-
-        return exist
+        diff = self.difference(self.target_elements, self.source_elements, VALUE_WITH_ATTRS_IGNORED_FIELDS)
+        return self.intersection(diff, self.source_elements, ID_NAME_IGNORED_FIELDS)
 
     def find_message_by_id_name(self, id_name, list):
         return py_.find(list, lambda el: el.get_id_name() == id_name)
@@ -1,53 +1,127 @@
 #!/usr/bin/env python3
 
 # Форматтер, приводящий fluent-файлы (.ftl) в соответствие стайлгайду
-# path - путь к папке, содержащий форматируемые файлы. Для форматирования всего проекта, необходимо заменить значение на root_dir_path
+# paths - пути к папкам или файлам, по умолчанию - папки целевых локалей (--targets, как в keyfinder)
+# --check - ничего не записывать, только вывести неотформатированные файлы и завершиться с кодом 1
+import argparse
+import os
+import sys
 import typing
+from concurrent.futures import ProcessPoolExecutor
 
 from file import FluentFile
-from project import Project
+from project import Project, DEFAULT_TARGET_LOCALES
 from fluent.syntax import ast, FluentParser, FluentSerializer
 
+# Строки, начинающиеся так, приклеиваются к предыдущей (разметка, которую сериализатор переносит на новую строку)
+JOINED_LINE_PREFIXES = ('[color=', '[bold]', '[font', '**')
+
 
 ######################################### Class defifitions ############################################################
 
 class FluentFormatter:
+    # Файл разбирается один раз и записывается, только если результат отличается от содержимого.
+    # Возвращает изменённые файлы
     @classmethod
-    def format(cls, fluent_files: typing.List[FluentFile]):
+    def format(cls, fluent_files: typing.List[FluentFile]) -> typing.List[FluentFile]:
+        changed_files = []
         for file in fluent_files:
-            file_data = file.read_data()
-            parsed_file_data = file.parse_data(file_data)
-            serialized_file_data = cls.format_serialized_file_data(file_data)
-            file.save_data(serialized_file_data)
+            raw_file_data = file.read_raw_data()
+            formatted_file_data = cls.format_serialized_file_data(raw_file_data.replace('\ufeff', ''))
+            # Сравнение с исходным содержимым: BOM тоже считается неформатированием и убирается записью
+            if formatted_file_data != raw_file_data:
+                file.save_data(formatted_file_data)
+                changed_files.append(file)
+
+        return changed_files
 
     @classmethod
     def format_serialized_file_data(cls, file_data: typing.AnyStr):
-        parsed_data = FluentParser().parse(file_data)
+        return cls.format_parsed_data(parser.parse(file_data))
+
+    @classmethod
+    def format_parsed_data(cls, parsed_data: ast.Resource):
+        return cls.join_markup_lines(cls.serialize(parsed_data))
+
+    @classmethod
+    def serialize(cls, parsed_data: ast.Resource):
+        return serializer.serialize(parsed_data)
 
-        serialized_data = FluentSerializer(with_junk=True).serialize(parsed_data)
-        
-        lines = serialized_data.split('\n')
+    @classmethod
+    def join_markup_lines(cls, serialized_data: typing.AnyStr):
         formatted_lines = []
-        for line in lines:
-            if (line.strip().startswith('[color=') or 
-                line.strip().startswith('[bold]') or 
-                line.strip().startswith('[font') or
-                line.strip().startswith('**')):
-                if formatted_lines:
-                    formatted_lines[-1] += ' ' + line.strip()
-                else:
-                    formatted_lines.append(line)
+        for line in serialized_data.split('\n'):
+            stripped_line = line.strip()
+            if formatted_lines and stripped_line.startswith(JOINED_LINE_PREFIXES):
+                formatted_lines[-1] += ' ' + stripped_line
             else:
                 formatted_lines.append(line)
-        
+
         return '\n'.join(formatted_lines)
 
+    @classmethod
+    def is_formatted(cls, file: FluentFile):
+        raw_file_data = file.read_raw_data()
+        return cls.format_serialized_file_data(raw_file_data.replace('\ufeff', '')) == raw_file_data
+
+
+def _is_formatted(file_path):
+    return FluentFormatter.is_formatted(FluentFile(file_path))
+
+
+def get_fluent_files_paths(paths):
+    files_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            files_paths.extend(project.get_files_paths_by_dir(path, 'ftl'))
+        else:
+            files_paths.append(path)
+
+    return sorted(files_paths)
 
 
 ######################################## Var definitions ###############################################################
 project = Project()
-fluent_files = project.get_fluent_files_by_dir(project.ru_locale_dir_path)
+parser = FluentParser()
+serializer = FluentSerializer(with_junk=True)
 
 ########################################################################################################################
 
-FluentFormatter.format(fluent_files)
+def main():
+    arg_parser = argparse.ArgumentParser(description='Форматирование fluent-файлов по стайлгайду')
+    arg_parser.add_argument('paths', nargs='*', help='Папки или файлы (по умолчанию - папки целевых локалей)')
+    arg_parser.add_argument('--targets', nargs='+', default=DEFAULT_TARGET_LOCALES, help='Целевые локали')
+    arg_parser.add_argument('--check', action='store_true', help='Только проверить, не записывая файлы')
+    arg_parser.add_argument('--jobs', '-j', type=int, default=None, help='Количество процессов для --check (по умолчанию - все ядра)')
+    args = arg_parser.parse_args()
+
+    target_project = Project(target_locales=args.targets)
+    files_paths = get_fluent_files_paths(args.paths or [target_project.get_locale_dir_path(locale)
+                                                        for locale in target_project.target_locales])
+
+    if not args.check:
+        changed_files = FluentFormatter.format([FluentFile(file_path) for file_path in files_paths])
+        print(f'Отформатировано файлов: {len(changed_files)} из {len(files_paths)}')
+        return 0
+
+    if args.jobs == 1:
+        results = map(_is_formatted, files_paths)
+        unformatted = [file_path for file_path, formatted in zip(files_paths, results) if not formatted]
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            results = executor.map(_is_formatted, files_paths, chunksize=32)
+            unformatted = [file_path for file_path, formatted in zip(files_paths, results) if not formatted]
+
+    for file_path in unformatted:
+        print(os.path.relpath(file_path, project.base_dir_path))
+
+    if unformatted:
+        print(f'Не отформатировано файлов: {len(unformatted)} из {len(files_paths)}')
+        return 1
+
+    print(f'Все файлы отформатированы ({len(files_paths)})')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
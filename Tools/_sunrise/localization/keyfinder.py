@@ -1,20 +1,24 @@
+import argparse
 import typing
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
 
 from pydash import py_
 
 from file import FluentFile
 from fluentast import FluentAstAbstract
 from fluentformatter import FluentFormatter
-from project import Project
+from project import Project, DEFAULT_SOURCE_LOCALE, DEFAULT_TARGET_LOCALES
 from fluent.syntax import ast, FluentParser, FluentSerializer
 
 
-# Осуществляет актуализацию ключей. Находит файлы английского перевода, проверяет: есть ли русскоязычная пара
-# Если нет - создаёт файл с копией переводов из англоязычного
-# Далее, пофайлово проверяются ключи. Если в английском файле больше ключей - создает недостающие в русском, с английской копией перевода
-# Отмечает русские файлы, в которых есть те ключи, что нет в аналогичных английских
-# Отмечает русские файлы, у которых нет англоязычной пары
+# Осуществляет актуализацию ключей. Находит файлы локали-источника (по умолчанию en-US), проверяет: есть ли пара в каждой
+# целевой локали (по умолчанию ru-RU, см. Project). Если нет - создаёт файл с копией переводов из источника
+# Далее, пофайлово проверяются ключи. Если в файле источника больше ключей - создает недостающие в целевом, с копией перевода
+# Отмечает целевые файлы, в которых есть те ключи, что нет в файле источника
+# Отмечает целевые файлы, у которых нет пары в источнике
+# Файл источника разбирается один раз и сравнивается со всеми целевыми локалями
 
 ######################################### Class defifitions ############################################################
 class RelativeFile:
@@ -30,191 +34,245 @@ class FilesFinder:
         self.created_files: typing.List[FluentFile] = []
 
     def get_relative_path_dict(self, file: FluentFile, locale):
-        if locale == 'ru-RU':
-            return RelativeFile(file=file, locale=locale,
-                                relative_path_from_locale=file.get_relative_path(self.project.ru_locale_dir_path))
-        elif locale == 'en-US':
-            return RelativeFile(file=file, locale=locale,
-                                relative_path_from_locale=file.get_relative_path(self.project.en_locale_dir_path))
-        else:
+        if locale not in self.project.get_locales():
             raise Exception(f'Локаль {locale} не поддерживается')
 
-    def get_file_pair(self, en_file: FluentFile) -> typing.Tuple[FluentFile, FluentFile]:
-        ru_file_path = en_file.full_path.replace('en-US', 'ru-RU')
-        ru_file = FluentFile(ru_file_path)
+        return RelativeFile(file=file, locale=locale,
+                            relative_path_from_locale=file.get_relative_path(self.project.get_locale_dir_path(locale)))
 
-        return en_file, ru_file
+    def get_target_file(self, source_relative_file: RelativeFile, locale) -> FluentFile:
+        return FluentFile(os.path.join(self.project.get_locale_dir_path(locale), source_relative_file.relative_path_from_locale))
 
     def execute(self):
         self.created_files = []
         groups = self.get_files_pars()
-        keys_without_pair = list(filter(lambda g: len(groups[g]) < 2, groups))
+        source_locale = self.project.source_locale
 
-        for key_without_pair in keys_without_pair:
-            relative_file: RelativeFile = groups.get(key_without_pair)[0]
+        for relative_path in sorted(groups):
+            relative_files = groups[relative_path]
+            source_relative_file = py_.find(relative_files, {'locale': source_locale})
+            existing_locales = {relative_file.locale for relative_file in relative_files}
 
-            if relative_file.locale == 'en-US':
-                ru_file = self.create_ru_analog(relative_file)
-                self.created_files.append(ru_file)
-            elif relative_file.locale == 'ru-RU':
+            if source_relative_file:
+                for locale in self.project.target_locales:
+                    if locale not in existing_locales:
+                        self.created_files.append(self.create_target_analog(source_relative_file, locale))
+                continue
+
+            for relative_file in relative_files:
                 is_engine_files = "robust-toolbox" in (relative_file.file.full_path)
                 is_corvax_files = "corvax" in (relative_file.file.full_path)
                 if not is_engine_files and not is_corvax_files:
-                    self.warn_en_analog_not_exist(relative_file)
-            else:
-                raise Exception(f'Файл {relative_file.file.full_path} имеет неизвестную локаль "{relative_file.locale}"')
+                    self.warn_source_analog_not_exist(relative_file)
 
         return self.created_files
 
     def get_files_pars(self):
-        en_fluent_files = self.project.get_fluent_files_by_dir(project.en_locale_dir_path)
-        ru_fluent_files = self.project.get_fluent_files_by_dir(project.ru_locale_dir_path)
-
-        en_fluent_relative_files = list(map(lambda f: self.get_relative_path_dict(f, 'en-US'), en_fluent_files))
-        ru_fluent_relative_files = list(map(lambda f: self.get_relative_path_dict(f, 'ru-RU'), ru_fluent_files))
-        relative_files = py_.flatten_depth(py_.concat(en_fluent_relative_files, ru_fluent_relative_files), depth=1)
+        relative_files = []
+        for locale in self.project.get_locales():
+            fluent_files = self.project.get_fluent_files_by_dir(self.project.get_locale_dir_path(locale))
+            relative_files.extend(self.get_relative_path_dict(f, locale) for f in fluent_files)
 
         return py_.group_by(relative_files, 'relative_path_from_locale')
 
-    def create_ru_analog(self, en_relative_file: RelativeFile) -> FluentFile:
-        en_file: FluentFile = en_relative_file.file
-        en_file_data = en_file.read_data()
-        ru_file_path = en_file.full_path.replace('en-US', 'ru-RU')
-        ru_file = FluentFile(ru_file_path)
-        ru_file.save_data(en_file_data)
+    def create_target_analog(self, source_relative_file: RelativeFile, locale) -> FluentFile:
+        source_file_data = source_relative_file.file.read_data()
+        target_file = self.get_target_file(source_relative_file, locale)
+        target_file.save_data(source_file_data)
 
-        logging.info(f'Создан файл {ru_file_path} с переводами из английского файла')
+        logging.info(f'Создан файл {target_file.full_path} с переводами из {self.project.source_locale}')
 
-        return ru_file
+        return target_file
 
-    def warn_en_analog_not_exist(self, ru_relative_file: RelativeFile):
-        file: FluentFile = ru_relative_file.file
-        en_file_path = file.full_path.replace('ru-RU', 'en-US')
+    def warn_source_analog_not_exist(self, relative_file: RelativeFile):
+        file: FluentFile = relative_file.file
+        source_file_path = os.path.join(self.project.get_locale_dir_path(self.project.source_locale), relative_file.relative_path_from_locale)
 
-        logging.warning(f'Файл {file.full_path} не имеет английского аналога по пути {en_file_path}')
+        logging.warning(f'Файл {file.full_path} не имеет аналога в {self.project.source_locale} по пути {source_file_path}')
 
 
 class KeyFinder:
-    def __init__(self, files_dict):
+    def __init__(self, files_dict, project: Project = None):
         self.files_dict = files_dict
+        self.project = project or Project()
         self.changed_files: typing.List[FluentFile] = []
-
-    def execute(self) -> typing.List[FluentFile]:
-        self.changed_files = []
-        for pair in self.files_dict:
-            ru_relative_file = py_.find(self.files_dict[pair], {'locale': 'ru-RU'})
-            en_relative_file = py_.find(self.files_dict[pair], {'locale': 'en-US'})
-
-            if not en_relative_file or not ru_relative_file:
+        # Сообщения копятся и выводятся после обработки группы, чтобы при параллельном запуске порядок вывода не зависел
+        # от того, какой процесс закончил раньше
+        self.log_records: typing.List[typing.Tuple[int, str]] = []
+
+    # Группы (файл источника, файлы целевых локалей с тем же относительным путём)
+    def get_groups(self) -> typing.List[typing.Tuple[str, typing.List[str]]]:
+        groups = []
+        for relative_path in sorted(self.files_dict):
+            relative_files = self.files_dict[relative_path]
+            source_relative_file = py_.find(relative_files, {'locale': self.project.source_locale})
+            target_files_paths = [relative_file.file.full_path
+                                  for locale in self.project.target_locales
+                                  for relative_file in relative_files if relative_file.locale == locale]
+
+            if not source_relative_file or not target_files_paths:
                 continue
 
-            ru_file: FluentFile = ru_relative_file.file
-            en_file: FluentFile = en_relative_file.file
-
-            self.compare_files(en_file, ru_file)
-
-        return self.changed_files
-
+            groups.append((source_relative_file.file.full_path, target_files_paths))
 
-    def compare_files(self, en_file, ru_file):
-        ru_file_parsed: ast.Resource = ru_file.parse_data(ru_file.read_data())
-        en_file_parsed: ast.Resource = en_file.parse_data(en_file.read_data())
+        return groups
 
-        self.write_to_ru_files(ru_file, ru_file_parsed, en_file_parsed)
-        self.log_not_exist_en_files(en_file, ru_file_parsed, en_file_parsed)
+    # jobs = 1 - обработка в текущем процессе, иначе группы распределяются по пулу процессов (None - все ядра).
+    # Группы независимы: каждая читает свой файл источника и пишет только свои целевые файлы
+    def execute(self, jobs=1) -> typing.List[FluentFile]:
+        self.changed_files = []
+        groups = self.get_groups()
+
+        if jobs == 1:
+            for source_file_path, target_files_paths in groups:
+                self.compare_group(FluentFile(source_file_path), [FluentFile(path) for path in target_files_paths])
+                self.flush_log()
+            return self.changed_files
+
+        tasks = [(self.project.source_locale, source_file_path, target_files_paths)
+                 for source_file_path, target_files_paths in groups]
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for changed_files_paths, log_records in executor.map(_compare_group, tasks, chunksize=16):
+                self.changed_files.extend(FluentFile(file_path) for file_path in changed_files_paths)
+                self.log_records = log_records
+                self.flush_log()
 
+        return self.changed_files
 
-    def write_to_ru_files(self, ru_file, ru_file_parsed, en_file_parsed):
-        for idx, en_message in enumerate(en_file_parsed.body):
-            if isinstance(en_message, ast.ResourceComment) or isinstance(en_message, ast.GroupComment) or isinstance(en_message, ast.Comment):
+    def log(self, level, message):
+        self.log_records.append((level, message))
+
+    def flush_log(self):
+        for level, message in self.log_records:
+            logging.log(level, message)
+        self.log_records = []
+
+    def compare_group(self, source_file, target_files):
+        source_file_parsed: ast.Resource = source_file.parse_data(source_file.read_data())
+        source_id_names = {FluentAstAbstract.get_id_name(message) for message in source_file_parsed.body} - {None}
+
+        for target_file in target_files:
+            target_file_parsed: ast.Resource = target_file.parse_data(target_file.read_data())
+            self.write_to_target_file(target_file, target_file_parsed, source_file_parsed)
+            self.log_not_exist_source_keys(source_file, target_file_parsed, source_id_names)
+
+    def compare_files(self, source_file, target_file):
+        self.compare_group(source_file, [target_file])
+
+    def write_to_target_file(self, target_file, target_file_parsed, source_file_parsed):
+        # Изменения копятся в AST, файл сериализуется и записывается один раз. Индекс id -> сообщение
+        # заменяет линейный поиск аналога по телу целевого файла. Узлы источника копируются: один и тот же
+        # разобранный источник используется для всех целевых локалей
+        target_messages_by_id = {}
+        for target_message in target_file_parsed.body:
+            target_id_name = FluentAstAbstract.get_id_name(target_message)
+            if target_id_name:
+                target_messages_by_id.setdefault(target_id_name, target_message)
+
+        added_messages = []
+        merged_messages = []
+
+        for idx, source_message in enumerate(source_file_parsed.body):
+            if isinstance(source_message, ast.ResourceComment) or isinstance(source_message, ast.GroupComment) or isinstance(source_message, ast.Comment):
                 continue
 
-            ru_message_analog_idx = py_.find_index(ru_file_parsed.body, lambda ru_message: self.find_duplicate_message_id_name(ru_message, en_message))
-            have_changes = False
+            source_id_name = FluentAstAbstract.get_id_name(source_message)
+            target_message_analog = target_messages_by_id.get(source_id_name) if source_id_name else None
 
             # Attributes
-            if getattr(en_message, 'attributes', None) and ru_message_analog_idx != -1:
-                if not ru_file_parsed.body[ru_message_analog_idx].attributes:
-                    ru_file_parsed.body[ru_message_analog_idx].attributes = en_message.attributes
-                    have_changes = True
+            if getattr(source_message, 'attributes', None) and target_message_analog is not None:
+                if not target_message_analog.attributes:
+                    target_message_analog.attributes = [attr.clone() for attr in source_message.attributes]
+                    merged_messages.append(source_message)
                 else:
-                    for en_attr in en_message.attributes:
-                        ru_attr_analog = py_.find(ru_file_parsed.body[ru_message_analog_idx].attributes, lambda ru_attr: ru_attr.id.name == en_attr.id.name)
-                        if not ru_attr_analog:
-                            ru_file_parsed.body[ru_message_analog_idx].attributes.append(en_attr)
-                            have_changes = True
+                    target_attr_names = {target_attr.id.name for target_attr in target_message_analog.attributes}
+                    for source_attr in source_message.attributes:
+                        if source_attr.id.name not in target_attr_names:
+                            target_message_analog.attributes.append(source_attr.clone())
+                            target_attr_names.add(source_attr.id.name)
+                            merged_messages.append(source_message)
 
             # New elements
-            if ru_message_analog_idx == -1:
-                ru_file_body = ru_file_parsed.body
-                if (len(ru_file_body) >= idx + 1):
-                    ru_file_parsed = self.append_message(ru_file_parsed, en_message, idx)
+            if target_message_analog is None:
+                new_message = source_message.clone()
+                target_file_body = target_file_parsed.body
+                if (len(target_file_body) >= idx + 1):
+                    target_file_parsed = self.append_message(target_file_parsed, new_message, idx)
                 else:
-                    ru_file_parsed = self.push_message(ru_file_parsed, en_message)
-                have_changes = True
-
-            if have_changes:
-                serialized = serializer.serialize(ru_file_parsed)
-                self.save_and_log_file(ru_file, serialized, en_message)
-
-    def log_not_exist_en_files(self, en_file, ru_file_parsed, en_file_parsed):
-        for idx, ru_message in enumerate(ru_file_parsed.body):
-            if isinstance(ru_message, ast.ResourceComment) or isinstance(ru_message, ast.GroupComment) or isinstance(ru_message, ast.Comment):
+                    target_file_parsed = self.push_message(target_file_parsed, new_message)
+                if source_id_name:
+                    target_messages_by_id.setdefault(source_id_name, new_message)
+                added_messages.append(source_message)
+
+        if added_messages or merged_messages:
+            serialized = serializer.serialize(target_file_parsed)
+            if os.path.isfile(target_file.full_path) and target_file.read_data() == serialized:
+                return
+            self.save_and_log_file(target_file, serialized, added_messages, merged_messages)
+
+    def log_not_exist_source_keys(self, source_file, target_file_parsed, source_id_names):
+        for target_message in target_file_parsed.body:
+            if isinstance(target_message, ast.ResourceComment) or isinstance(target_message, ast.GroupComment) or isinstance(target_message, ast.Comment):
                 continue
 
-            en_message_analog = py_.find(en_file_parsed.body, lambda en_message: self.find_duplicate_message_id_name(ru_message, en_message))
+            if FluentAstAbstract.get_id_name(target_message) not in source_id_names:
+                self.log(logging.WARNING, f'Ключ "{FluentAstAbstract.get_id_name(target_message)}" не имеет аналога в {self.project.source_locale} по пути {source_file.full_path}"')
 
-            if not en_message_analog:
-                logging.warning(f'Ключ "{FluentAstAbstract.get_id_name(ru_message)}" не имеет английского аналога по пути {en_file.full_path}"')
+    def append_message(self, target_file_parsed, source_message, source_message_idx):
+        target_file_parsed.body.insert(source_message_idx, source_message)
 
-    def append_message(self, ru_file_parsed, en_message, en_message_idx):
-        ru_message_part_1 = ru_file_parsed.body[0:en_message_idx]
-        ru_message_part_middle = [en_message]
-        ru_message_part_2 = ru_file_parsed.body[en_message_idx:]
-        new_body = py_.flatten_depth([ru_message_part_1, ru_message_part_middle, ru_message_part_2], depth=1)
-        ru_file_parsed.body = new_body
+        return target_file_parsed
 
-        return ru_file_parsed
+    def push_message(self, target_file_parsed, source_message):
+        target_file_parsed.body.append(source_message)
+        return target_file_parsed
 
-    def push_message(self,  ru_file_parsed, en_message):
-        ru_file_parsed.body.append(en_message)
-        return ru_file_parsed
-
-    def save_and_log_file(self, file, file_data, message):
+    def save_and_log_file(self, file, file_data, added_messages, merged_messages):
         file.save_data(file_data)
-        logging.info(f'В файл {file.full_path} добавлен ключ "{FluentAstAbstract.get_id_name(message)}"')
+        for message in added_messages:
+            self.log(logging.INFO, f'В файл {file.full_path} добавлен ключ "{FluentAstAbstract.get_id_name(message)}"')
+        for message in py_.uniq(merged_messages):
+            self.log(logging.INFO, f'В файле {file.full_path} дополнены атрибуты ключа "{FluentAstAbstract.get_id_name(message)}"')
         self.changed_files.append(file)
 
-    def find_duplicate_message_id_name(self, ru_message, en_message):
-        ru_element_id_name = FluentAstAbstract.get_id_name(ru_message)
-        en_element_id_name = FluentAstAbstract.get_id_name(en_message)
-
-        if not ru_element_id_name or not en_element_id_name:
-            return False
 
-        if ru_element_id_name == en_element_id_name:
-            return ru_message
-        else:
-            return None
+def _compare_group(task):
+    source_locale, source_file_path, target_files_paths = task
+    key_finder = KeyFinder({}, Project(source_locale, []))
+    key_finder.compare_group(FluentFile(source_file_path), [FluentFile(path) for path in target_files_paths])
+    return [file.full_path for file in key_finder.changed_files], key_finder.log_records
 
 ######################################## Var definitions ###############################################################
 
-logging.basicConfig(level = logging.INFO)
-project = Project()
 parser = FluentParser()
 serializer = FluentSerializer(with_junk=True)
-files_finder = FilesFinder(project)
-key_finder = KeyFinder(files_finder.get_files_pars())
 
 ########################################################################################################################
 
-print('Проверка актуальности файлов ...')
-created_files = files_finder.execute()
-if len(created_files):
-    print('Форматирование созданных файлов ...')
-    FluentFormatter.format(created_files)
-print('Проверка актуальности ключей ...')
-changed_files = key_finder.execute()
-if len(changed_files):
-    print('Форматирование изменённых файлов ...')
-    FluentFormatter.format(changed_files)
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Актуализация ключей целевых локалей по локали-источнику')
+    arg_parser.add_argument('--source', default=DEFAULT_SOURCE_LOCALE, help='Локаль-источник')
+    arg_parser.add_argument('--targets', nargs='+', default=DEFAULT_TARGET_LOCALES, help='Целевые локали')
+    arg_parser.add_argument('--jobs', '-j', type=int, default=None, help='Количество процессов (по умолчанию - все ядра, 1 - без пула)')
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level = logging.INFO)
+    project = Project(args.source, args.targets)
+    # Раньше целевые файлы форматировались побочным эффектом импорта fluentformatter, теперь - явно
+    print('Форматирование файлов целевых локалей ...')
+    for locale in project.target_locales:
+        FluentFormatter.format(project.get_fluent_files_by_dir(project.get_locale_dir_path(locale)))
+
+    files_finder = FilesFinder(project)
+    key_finder = KeyFinder(files_finder.get_files_pars(), project)
+
+    print('Проверка актуальности файлов ...')
+    created_files = files_finder.execute()
+    if len(created_files):
+        print('Форматирование созданных файлов ...')
+        FluentFormatter.format(created_files)
+    print('Проверка актуальности ключей ...')
+    changed_files = key_finder.execute(args.jobs)
+    if len(changed_files):
+        print('Форматирование изменённых файлов ...')
+        FluentFormatter.format(changed_files)
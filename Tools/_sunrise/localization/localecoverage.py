@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+# Проверка покрытия локализацией прототипов сущностей.
+# Индекс прототипов (protoindex) соединяется с индексом ключей Fluent по каждой локали, после чего сообщается:
+#   - missing: у сущности с name нет ключа ent-{id};
+#   - misplaced: ключ есть, но не в том файле, куда его положил бы yamlextractor
+#     (_prototypes/<каталог прототипа в нижнем регистре>/<имя файла>.ftl);
+#   - stale: ключ ent-{id} в _prototypes, которому не соответствует ни одна сущность.
+# Ключи собираются регулярным выражением по строкам без разбора AST, поэтому проверка занимает секунды.
+
+import argparse
+import json
+import logging
+import os
+import pathlib
+import re
+import sys
+import typing
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'prototypes'))
+
+from fluentast import FluentSerializedMessage
+from project import Project
+from protoindex import PrototypeIndex
+
+DEFAULT_LOCALES = ['en-US', 'ru-RU']
+PROTOTYPES_LOCALE_DIR = '_prototypes'
+ENTITY_KEY_PREFIX = FluentSerializedMessage.get_key('')
+# Сообщение начинается с идентификатора в первой колонке; термы (-term) и атрибуты (.attr) пропускаются
+MESSAGE_ID_PATTERN = re.compile(r'^([a-zA-Z][\w-]*)[ \t]*=', re.MULTILINE)
+
+
+class KeyLocation(typing.NamedTuple):
+    file: str
+    line: int
+
+
+class CoverageIssue(typing.NamedTuple):
+    locale: str
+    kind: str
+    key: str
+    prototype_file: typing.Optional[str]
+    expected_file: typing.Optional[str]
+    found_in: typing.List[str]
+
+
+def build_locale_key_index(locale_dir_path) -> typing.Dict[str, typing.List[KeyLocation]]:
+    keys: typing.Dict[str, typing.List[KeyLocation]] = {}
+    for path in sorted(pathlib.Path(locale_dir_path).rglob('*.ftl')):
+        relative_path = path.relative_to(locale_dir_path).as_posix()
+        with open(path, 'r', encoding='utf-8-sig') as file:
+            data = file.read()
+        for match in MESSAGE_ID_PATTERN.finditer(data):
+            key = match.group(1)
+            if key.startswith(ENTITY_KEY_PREFIX):
+                line = data.count('\n', 0, match.start()) + 1
+                keys.setdefault(key, []).append(KeyLocation(relative_path, line))
+    return keys
+
+
+# Путь, по которому yamlextractor создаёт ключи для файла прототипов (см. YAMLExtractor.execute)
+def get_expected_locale_file(prototype_file) -> str:
+    parent_dir, file_name = os.path.split(prototype_file)
+    file_name = file_name.split('.')[0]
+    return pathlib.PurePosixPath(PROTOTYPES_LOCALE_DIR, parent_dir.lower(), f'{file_name}.ftl').as_posix()
+
+
+def check_locale(locale, records, keys) -> typing.List[CoverageIssue]:
+    issues = []
+    entity_keys = set()
+
+    for record in records:
+        key = FluentSerializedMessage.get_key(record.id)
+        entity_keys.add(key)
+        expected_file = get_expected_locale_file(record.file)
+        locations = keys.get(key)
+
+        if not locations:
+            if record.name is not None:
+                issues.append(CoverageIssue(locale, 'missing', key, record.file, expected_file, []))
+            continue
+
+        found_in = [location.file for location in locations]
+        if expected_file not in found_in:
+            issues.append(CoverageIssue(locale, 'misplaced', key, record.file, expected_file, found_in))
+
+    # Вне _prototypes префикс ent- встречается и у обычных строк интерфейса, устаревшими считаются только ключи прототипов
+    for key in sorted(keys.keys() - entity_keys):
+        found_in = [location.file for location in keys[key] if location.file.startswith(f'{PROTOTYPES_LOCALE_DIR}/')]
+        if found_in:
+            issues.append(CoverageIssue(locale, 'stale', key, None, None, found_in))
+
+    return issues
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Проверка покрытия сущностей ключами локализации ent-*')
+    parser.add_argument('--locales', nargs='+', default=DEFAULT_LOCALES, help='Проверяемые локали')
+    parser.add_argument('--kinds', nargs='+', default=['missing', 'misplaced', 'stale'],
+                        choices=['missing', 'misplaced', 'stale'], help='Выводимые виды проблем')
+    parser.add_argument('--json', metavar='FILE', help='Записать отчёт в JSON')
+    parser.add_argument('--strict', action='store_true', help='Завершиться с ошибкой, если найдены проблемы')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    project = Project()
+    index = PrototypeIndex()
+    index.update()
+    # Имя и файл лежат в отдельных колонках индекса, данные прототипов не нужны
+    records = index.get_all('entity', with_data=False)
+    index.close()
+
+    issues = []
+    for locale in args.locales:
+        keys = build_locale_key_index(os.path.join(project.locales_dir_path, locale))
+        issues.extend(issue for issue in check_locale(locale, records, keys) if issue.kind in args.kinds)
+
+    for issue in issues:
+        if issue.kind == 'missing':
+            print(f'{issue.locale}: нет ключа {issue.key} (Resources/Prototypes/{issue.prototype_file}), '
+                  f'ожидается в {issue.expected_file}')
+        elif issue.kind == 'misplaced':
+            print(f'{issue.locale}: ключ {issue.key} в {", ".join(issue.found_in)}, ожидается в {issue.expected_file}')
+        else:
+            print(f'{issue.locale}: ключ {issue.key} в {", ".join(issue.found_in)} не соответствует ни одной сущности')
+
+    for locale in args.locales:
+        counts = {kind: sum(1 for issue in issues if issue.locale == locale and issue.kind == kind) for kind in args.kinds}
+        logging.info(f'{locale}: ' + ', '.join(f'{kind}: {count}' for kind, count in counts.items()))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf8') as file:
+            json.dump([issue._asdict() for issue in issues], file, ensure_ascii=False, indent=1)
+
+    if args.strict and issues:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+
+# Индекс ключей локализации Resources/Locale в SQLite.
+# Файлы .ftl всех локалей разбираются в пуле процессов, в базу пишутся (locale, key, kind, file, line, attributes,
+# placeables). Повторный запуск переразбирает только файлы с изменившимся хешем, поэтому дубликаты, ключи только
+# одной локали и ключи не в том файле можно искать без разбора Fluent.
+# Также пишутся part_placeables - те же ссылки отдельно по значению и каждому атрибуту.
+#
+# Использование из других скриптов Tools/_sunrise/localization:
+#   from localeindex import LocaleIndex
+#   index = LocaleIndex()
+#   index.update()
+#   index.get_missing_keys('en-US', 'ru-RU')
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import sqlite3
+import sys
+import typing
+from concurrent.futures import ProcessPoolExecutor
+
+from fluent.syntax import ast, FluentParser
+
+from project import Project
+from protoindex import CACHE_DIR_PATH
+
+DEFAULT_DB_PATH = os.path.join(CACHE_DIR_PATH, 'locales.db')
+LOCALES_DIR_PATH = Project().locales_dir_path
+
+# При изменении структуры базы или формата данных индекс перестраивается целиком
+SCHEMA_VERSION = 3
+
+_parser = FluentParser()
+
+
+class LocaleKeyRecord(typing.NamedTuple):
+    locale: str
+    key: str
+    kind: str
+    file: str
+    line: int
+    attributes: typing.List[str]
+    placeables: typing.List[str]
+    # Ссылки значения (ключ '') и каждого атрибута (ключ - имя атрибута)
+    part_placeables: typing.Dict[str, typing.List[str]]
+
+    @classmethod
+    def from_row(cls, row):
+        locale, key, kind, file, line, attributes, placeables, part_placeables = row
+        return cls(locale, key, kind, file, line, json.loads(attributes), json.loads(placeables), json.loads(part_placeables))
+
+
+def get_file_hash(file_path):
+    with open(file_path, 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+# Ссылки внутри значения и атрибутов: $переменные, сообщения, -термы и функции
+def collect_placeables(node, placeables):
+    if isinstance(node, ast.VariableReference):
+        placeables.add(f'${node.id.name}')
+    elif isinstance(node, ast.MessageReference):
+        placeables.add(node.id.name + (f'.{node.attribute.name}' if node.attribute else ''))
+    elif isinstance(node, ast.TermReference):
+        placeables.add(f'-{node.id.name}' + (f'.{node.attribute.name}' if node.attribute else ''))
+    elif isinstance(node, ast.FunctionReference):
+        placeables.add(f'{node.id.name}()')
+
+    if isinstance(node, ast.BaseNode):
+        for key, value in vars(node).items():
+            if key not in ('span', 'comment'):
+                collect_placeables(value, placeables)
+    elif isinstance(node, list):
+        for item in node:
+            collect_placeables(item, placeables)
+
+    return placeables
+
+
+def parse_locale_file(locales_dir_path, relative_path):
+    full_path = os.path.join(locales_dir_path, relative_path)
+    with open(full_path, 'rb') as file:
+        raw_data = file.read()
+
+    data = raw_data.decode('utf-8-sig')
+    locale, file_path = relative_path.split('/', 1)
+    resource = _parser.parse(data)
+
+    rows = []
+    line = 1
+    position = 0
+    for entry in resource.body:
+        if not isinstance(entry, (ast.Message, ast.Term)):
+            continue
+
+        # Смещения span возрастают, поэтому номер строки считается инкрементально.
+        # span записи начинается с присоединённого комментария, поэтому строка берётся по идентификатору
+        line += data.count('\n', position, entry.id.span.start)
+        position = entry.id.span.start
+
+        kind = 'message' if isinstance(entry, ast.Message) else 'term'
+        key = entry.id.name if kind == 'message' else f'-{entry.id.name}'
+        attributes = [attribute.id.name for attribute in entry.attributes]
+        placeables = sorted(collect_placeables([entry.value, entry.attributes], set()))
+        part_placeables = {'': sorted(collect_placeables(entry.value, set()))} if entry.value else {}
+        for attribute in entry.attributes:
+            part_placeables[attribute.id.name] = sorted(collect_placeables(attribute.value, set()))
+        rows.append((locale, key, kind, file_path, line, json.dumps(attributes), json.dumps(placeables), json.dumps(part_placeables)))
+
+    return relative_path, hashlib.sha1(raw_data).hexdigest(), rows
+
+
+def _parse_locale_file_safe(args):
+    locales_dir_path, relative_path = args
+    try:
+        return parse_locale_file(locales_dir_path, relative_path), None
+    except Exception as e:
+        return None, (relative_path, str(e))
+
+
+class LocaleIndex:
+    def __init__(self, db_path=DEFAULT_DB_PATH, locales_dir_path=LOCALES_DIR_PATH):
+        self.db_path = db_path
+        self.locales_dir_path = locales_dir_path
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.create_tables()
+
+    def create_tables(self):
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self.conn.executescript('''
+                DROP TABLE IF EXISTS files;
+                DROP TABLE IF EXISTS keys;
+            ''')
+
+        self.conn.executescript(f'''
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                hash TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS keys (
+                locale TEXT NOT NULL,
+                key TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                file TEXT NOT NULL,
+                line INTEGER NOT NULL,
+                attributes TEXT NOT NULL,
+                placeables TEXT NOT NULL,
+                part_placeables TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS keys_locale_key ON keys (locale, key);
+            CREATE INDEX IF NOT EXISTS keys_locale_file ON keys (locale, file);
+            PRAGMA user_version = {SCHEMA_VERSION};
+        ''')
+        self.conn.commit()
+
+    # Пути вида <локаль>/<путь внутри локали>
+    def get_locale_files(self) -> typing.List[str]:
+        paths = []
+        for path in pathlib.Path(self.locales_dir_path).glob('*/**/*.ftl'):
+            paths.append(path.relative_to(self.locales_dir_path).as_posix())
+        return sorted(paths)
+
+    # Переразбирает новые и изменённые файлы, удаляет из индекса пропавшие. Возвращает (изменённые, удалённые)
+    def update(self, jobs=None) -> typing.Tuple[typing.List[str], typing.List[str]]:
+        indexed = dict(self.conn.execute('SELECT path, hash FROM files'))
+        current = self.get_locale_files()
+
+        changed = []
+        for relative_path in current:
+            if indexed.get(relative_path) != get_file_hash(os.path.join(self.locales_dir_path, relative_path)):
+                changed.append(relative_path)
+        removed = sorted(set(indexed) - set(current))
+
+        results = []
+        if changed:
+            tasks = [(self.locales_dir_path, relative_path) for relative_path in changed]
+            if jobs == 1 or len(changed) == 1:
+                results = list(map(_parse_locale_file_safe, tasks))
+            else:
+                with ProcessPoolExecutor(max_workers=jobs) as executor:
+                    results = list(executor.map(_parse_locale_file_safe, tasks, chunksize=16))
+
+        with self.conn:
+            for relative_path in removed + changed:
+                locale, file_path = relative_path.split('/', 1)
+                self.conn.execute('DELETE FROM keys WHERE locale = ? AND file = ?', (locale, file_path))
+                self.conn.execute('DELETE FROM files WHERE path = ?', (relative_path,))
+
+            for result, error in results:
+                if error:
+                    logging.warning(f'Не удалось разобрать {error[0]}: {error[1]}')
+                    continue
+
+                relative_path, file_hash, rows = result
+                self.conn.executemany('INSERT INTO keys VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+                self.conn.execute('INSERT INTO files VALUES (?, ?)', (relative_path, file_hash))
+
+        return changed, removed
+
+    def get(self, key, locale=None) -> typing.List[LocaleKeyRecord]:
+        if locale:
+            rows = self.conn.execute('SELECT * FROM keys WHERE locale = ? AND key = ? ORDER BY file, line', (locale, key))
+        else:
+            rows = self.conn.execute('SELECT * FROM keys WHERE key = ? ORDER BY locale, file, line', (key,))
+        return [LocaleKeyRecord.from_row(row) for row in rows]
+
+    def get_all(self, locale) -> typing.List[LocaleKeyRecord]:
+        rows = self.conn.execute('SELECT * FROM keys WHERE locale = ? ORDER BY file, line', (locale,))
+        return [LocaleKeyRecord.from_row(row) for row in rows]
+
+    def get_locales(self) -> typing.Dict[str, int]:
+        return dict(self.conn.execute('SELECT locale, COUNT(*) FROM keys GROUP BY locale ORDER BY locale'))
+
+    # Ключи, объявленные в локали больше одного раза (в разных файлах или в одном)
+    def get_duplicates(self, locale) -> typing.Dict[str, typing.List[LocaleKeyRecord]]:
+        rows = self.conn.execute('''
+            SELECT * FROM keys WHERE locale = ? AND key IN (
+                SELECT key FROM keys WHERE locale = ? GROUP BY key HAVING COUNT(*) > 1
+            ) ORDER BY key, file, line
+        ''', (locale, locale))
+        duplicates = {}
+        for row in rows:
+            record = LocaleKeyRecord.from_row(row)
+            duplicates.setdefault(record.key, []).append(record)
+        return duplicates
+
+    # Ключи локали locale, которых нет в локали other_locale
+    def get_missing_keys(self, locale, other_locale) -> typing.List[LocaleKeyRecord]:
+        rows = self.conn.execute('''
+            SELECT * FROM keys AS k WHERE locale = ? AND NOT EXISTS (
+                SELECT 1 FROM keys WHERE locale = ? AND key = k.key
+            ) ORDER BY file, line
+        ''', (locale, other_locale))
+        return [LocaleKeyRecord.from_row(row) for row in rows]
+
+    # Ключи target_locale, которые есть в source_locale, но лежат по другому пути внутри локали.
+    # Возвращает пары (запись target, пути в source)
+    def get_misplaced_keys(self, source_locale, target_locale) -> typing.List[typing.Tuple[LocaleKeyRecord, typing.List[str]]]:
+        source_files: typing.Dict[str, typing.List[str]] = {}
+        for key, file in self.conn.execute('SELECT key, file FROM keys WHERE locale = ? ORDER BY file', (source_locale,)):
+            source_files.setdefault(key, []).append(file)
+
+        misplaced = []
+        for record in self.get_all(target_locale):
+            files = source_files.get(record.key)
+            if files and record.file not in files:
+                misplaced.append((record, files))
+        return misplaced
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Индекс ключей локализации Resources/Locale в SQLite')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='Путь к базе индекса')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='Количество процессов (по умолчанию - все ядра)')
+    parser.add_argument('--rebuild', action='store_true', help='Перестроить индекс с нуля')
+    parser.add_argument('--get', metavar='KEY', help='Вывести ключ во всех локалях')
+    parser.add_argument('--duplicates', metavar='LOCALE', help='Вывести дубликаты ключей локали')
+    parser.add_argument('--missing', nargs=2, metavar=('LOCALE', 'OTHER'), help='Ключи LOCALE, которых нет в OTHER')
+    parser.add_argument('--misplaced', nargs=2, metavar=('SOURCE', 'TARGET'), help='Ключи TARGET не в том файле, что в SOURCE')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.rebuild and os.path.isfile(args.db):
+        os.remove(args.db)
+
+    index = LocaleIndex(args.db)
+    changed, removed = index.update(args.jobs)
+    logging.info(f'Переиндексировано файлов: {len(changed)}, удалено: {len(removed)}')
+
+    if args.get:
+        for record in index.get(args.get):
+            print(f'{record.locale}/{record.file}:{record.line}: {record.key} {record.attributes} {record.placeables}')
+
+    if args.duplicates:
+        duplicates = index.get_duplicates(args.duplicates)
+        for key, records in duplicates.items():
+            print(f'Дубликат {key}: ' + ', '.join(f'{record.file}:{record.line}' for record in records))
+        logging.info(f'Дубликатов: {len(duplicates)}')
+
+    if args.missing:
+        missing = index.get_missing_keys(*args.missing)
+        for record in missing:
+            print(f'{record.locale}/{record.file}:{record.line}: {record.key} отсутствует в {args.missing[1]}')
+        logging.info(f'Отсутствующих ключей: {len(missing)}')
+
+    if args.misplaced:
+        misplaced = index.get_misplaced_keys(*args.misplaced)
+        for record, files in misplaced:
+            print(f'{record.locale}/{record.file}:{record.line}: {record.key} в {args.misplaced[0]} лежит в {", ".join(files)}')
+        logging.info(f'Ключей не на своём месте: {len(misplaced)}')
+
+    if not (args.get or args.duplicates or args.missing or args.misplaced):
+        logging.info('Ключей в индексе: ' + ', '.join(f'{locale}: {count}' for locale, count in index.get_locales().items()))
+
+    index.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
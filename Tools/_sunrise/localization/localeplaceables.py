@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+# Проверка согласованности подстановок между локалями.
+# Перевод, в котором потерялась или переименована { $переменная } или ссылка на { -терм }, ломается только во время
+# игры, а validate_yml.py работает со строками и этого не видит. Ссылки берутся из индекса локалей (localeindex):
+# файлы разбираются в пуле процессов и только при изменении, сама сверка идёт по множествам.
+# Для каждого ключа, который есть в обеих локалях, значение и каждый общий атрибут сравниваются отдельно:
+#   - missing: ссылка есть в локали-источнике, но не в переводе;
+#   - extra: ссылка есть в переводе, но не в локали-источнике.
+
+import argparse
+import json
+import logging
+import sys
+import typing
+
+from localeindex import LocaleIndex, LocaleKeyRecord, DEFAULT_DB_PATH
+from project import DEFAULT_SOURCE_LOCALE, DEFAULT_TARGET_LOCALES
+
+# Вид ссылки по первому символу (см. localeindex.collect_placeables)
+REFERENCE_KINDS = {
+    'variables': '$',
+    'terms': '-',
+}
+
+
+class PlaceableIssue(typing.NamedTuple):
+    locale: str
+    key: str
+    part: str
+    file: str
+    line: int
+    kind: str
+    references: typing.List[str]
+
+
+def get_references(placeables, prefixes) -> typing.Set[str]:
+    return {placeable for placeable in placeables if placeable.startswith(prefixes)}
+
+
+def check_locale(source_records: typing.List[LocaleKeyRecord], target_records: typing.List[LocaleKeyRecord],
+                 prefixes) -> typing.List[PlaceableIssue]:
+    # При дубликатах ключа в источнике сверка идёт с первым объявлением
+    source_by_key: typing.Dict[str, LocaleKeyRecord] = {}
+    for record in source_records:
+        source_by_key.setdefault(record.key, record)
+
+    issues = []
+    for record in target_records:
+        source_record = source_by_key.get(record.key)
+        if not source_record:
+            continue
+
+        # Отсутствующие атрибуты - забота keyfinder, здесь сравниваются только общие части
+        for part in sorted(source_record.part_placeables.keys() & record.part_placeables.keys()):
+            source_references = get_references(source_record.part_placeables[part], prefixes)
+            target_references = get_references(record.part_placeables[part], prefixes)
+            missing = sorted(source_references - target_references)
+            extra = sorted(target_references - source_references)
+            if missing:
+                issues.append(PlaceableIssue(record.locale, record.key, part, record.file, record.line, 'missing', missing))
+            if extra:
+                issues.append(PlaceableIssue(record.locale, record.key, part, record.file, record.line, 'extra', extra))
+
+    return issues
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Проверка совпадения $переменных и -термов в переводах')
+    parser.add_argument('--source', default=DEFAULT_SOURCE_LOCALE, help='Локаль-источник')
+    parser.add_argument('--targets', nargs='+', default=DEFAULT_TARGET_LOCALES, help='Проверяемые локали')
+    parser.add_argument('--references', nargs='+', default=list(REFERENCE_KINDS), choices=list(REFERENCE_KINDS),
+                        help='Проверяемые виды ссылок')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='Путь к базе индекса локалей')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='Количество процессов (по умолчанию - все ядра)')
+    parser.add_argument('--json', metavar='FILE', help='Записать отчёт в JSON')
+    parser.add_argument('--strict', action='store_true', help='Завершиться с ошибкой, если найдены проблемы')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    index = LocaleIndex(args.db)
+    changed, removed = index.update(args.jobs)
+    logging.info(f'Переиндексировано файлов: {len(changed)}, удалено: {len(removed)}')
+
+    prefixes = tuple(REFERENCE_KINDS[kind] for kind in args.references)
+    source_records = index.get_all(args.source)
+    issues = []
+    for locale in args.targets:
+        issues.extend(check_locale(source_records, index.get_all(locale), prefixes))
+    index.close()
+
+    for issue in issues:
+        key = f'{issue.key}.{issue.part}' if issue.part else issue.key
+        references = ', '.join(issue.references)
+        if issue.kind == 'missing':
+            print(f'{issue.locale}/{issue.file}:{issue.line}: {key}: нет {references} (есть в {args.source})')
+        else:
+            print(f'{issue.locale}/{issue.file}:{issue.line}: {key}: лишние {references} (нет в {args.source})')
+
+    for locale in args.targets:
+        counts = {kind: sum(1 for issue in issues if issue.locale == locale and issue.kind == kind) for kind in ('missing', 'extra')}
+        logging.info(f'{locale}: ' + ', '.join(f'{kind}: {count}' for kind, count in counts.items()))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf8') as file:
+            json.dump([issue._asdict() for issue in issues], file, ensure_ascii=False, indent=1)
+
+    if args.strict and issues:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
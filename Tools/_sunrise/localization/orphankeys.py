@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+
+# Поиск ключей локализации, на которые ничего не ссылается.
+# Ссылки собираются регулярными выражениями в пуле процессов:
+#   - .cs в Content.*: строковые литералы вида ключа, у интерполированных ($"marking-{id}") - префикс до первой
+#     подстановки, литералы на '-' ("reagent-name-" + id) считаются префиксами;
+#   - .xaml в Content.*: {Loc 'key'}, {Loc key} и значения атрибутов вида ключа;
+#   - .yml в Resources/Prototypes: значения вида ключа, префиксы датасетов, ent-{id} для id прототипов;
+#   - .ftl: ссылки на сообщения и термы из других ключей (placeables индекса локалей).
+# Результат по каждому файлу хранится в SQLite по хешу, поэтому повторно разбираются только изменённые файлы.
+# Ключ считается вероятно неиспользуемым, если он не встречается среди ссылок и не начинается ни с одного префикса.
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import re
+import sqlite3
+import sys
+import typing
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'prototypes'))
+
+from localeindex import LocaleIndex, LocaleKeyRecord
+from project import Project, DEFAULT_SOURCE_LOCALE
+from protoindex import BASE_DIR_PATH, CACHE_DIR_PATH, PROTOTYPES_DIR_PATH
+
+DEFAULT_DB_PATH = os.path.join(CACHE_DIR_PATH, 'locale_refs.db')
+CODE_EXTENSIONS = ('.cs', '.xaml')
+
+# При изменении регулярных выражений или формата данных кеш перестраивается целиком
+SCHEMA_VERSION = 1
+
+# Литералы вида ключа ищутся напрямую, без разбора строк C#: кавычек внутри ключа не бывает, а вложенные
+# литералы в интерполяции ($"{Loc.GetString("key")} #{id}") иначе разбиваются на части
+CS_KEY_PATTERN = re.compile(r'"([A-Za-z][\w-]*(?:\.[\w-]+)?)"')
+CS_INTERPOLATED_PREFIX_PATTERN = re.compile(r'(?:\$@?|@\$)"([A-Za-z][\w-]*-)\{')
+XAML_LOC_PATTERN = re.compile(r'\{Loc\s+\'?([A-Za-z][\w.-]*)\'?\s*\}')
+XAML_ATTRIBUTE_PATTERN = re.compile(r'="([A-Za-z][\w-]*(?:\.[\w-]+)?)"')
+YAML_VALUE_PATTERN = re.compile(r'[A-Za-z][\w-]*(?:\.[\w-]+)?')
+YAML_ID_PATTERN = re.compile(r'^\s*(?:-\s+)?id:\s*["\']?([\w-]+)', re.MULTILINE)
+ENTITY_KEY_PREFIX = 'ent-'
+
+
+class SourceReferences(typing.NamedTuple):
+    keys: typing.Set[str]
+    prefixes: typing.Set[str]
+
+
+# Значение на '-' - префикс, к которому код или датасет дописывает окончание; ключ.атрибут ссылается на сообщение
+def add_value(value, references: SourceReferences):
+    if value.endswith('-'):
+        references.prefixes.add(value)
+    else:
+        references.keys.add(value.split('.', 1)[0])
+
+
+def collect_cs_references(data, references: SourceReferences):
+    for match in CS_KEY_PATTERN.finditer(data):
+        add_value(match.group(1), references)
+    for match in CS_INTERPOLATED_PREFIX_PATTERN.finditer(data):
+        references.prefixes.add(match.group(1))
+
+
+def collect_xaml_references(data, references: SourceReferences):
+    for match in XAML_LOC_PATTERN.finditer(data):
+        add_value(match.group(1), references)
+    for match in XAML_ATTRIBUTE_PATTERN.finditer(data):
+        add_value(match.group(1), references)
+
+
+def collect_yaml_references(data, references: SourceReferences):
+    for match in YAML_VALUE_PATTERN.finditer(data):
+        add_value(match.group(0), references)
+    # Ключи сущностей генерируются из id (см. yamlextractor)
+    for match in YAML_ID_PATTERN.finditer(data):
+        references.keys.add(f'{ENTITY_KEY_PREFIX}{match.group(1)}')
+
+
+def scan_source_file(base_dir_path, relative_path):
+    with open(os.path.join(base_dir_path, relative_path), 'rb') as file:
+        raw_data = file.read()
+
+    data = raw_data.decode('utf-8-sig', errors='replace')
+    references = SourceReferences(set(), set())
+    if relative_path.endswith('.cs'):
+        collect_cs_references(data, references)
+    elif relative_path.endswith('.xaml'):
+        collect_xaml_references(data, references)
+    else:
+        collect_yaml_references(data, references)
+
+    return relative_path, hashlib.sha1(raw_data).hexdigest(), sorted(references.keys), sorted(references.prefixes)
+
+
+def _scan_source_file_safe(args):
+    base_dir_path, relative_path = args
+    try:
+        return scan_source_file(base_dir_path, relative_path), None
+    except Exception as e:
+        return None, (relative_path, str(e))
+
+
+def get_file_hash(file_path):
+    with open(file_path, 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+class LocaleReferenceIndex:
+    def __init__(self, db_path=DEFAULT_DB_PATH, base_dir_path=BASE_DIR_PATH):
+        self.db_path = db_path
+        self.base_dir_path = base_dir_path
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.create_tables()
+
+    def create_tables(self):
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self.conn.execute('DROP TABLE IF EXISTS sources')
+
+        self.conn.executescript(f'''
+            CREATE TABLE IF NOT EXISTS sources (
+                path TEXT PRIMARY KEY,
+                hash TEXT NOT NULL,
+                keys TEXT NOT NULL,
+                prefixes TEXT NOT NULL
+            );
+            PRAGMA user_version = {SCHEMA_VERSION};
+        ''')
+        self.conn.commit()
+
+    # Пути относительно корня репозитория: код Content.* и прототипы
+    def get_source_files(self) -> typing.List[str]:
+        base_dir_path = pathlib.Path(self.base_dir_path)
+        paths = []
+        for project_dir in sorted(base_dir_path.glob('Content.*')):
+            for root, _, filenames in os.walk(project_dir):
+                paths.extend(pathlib.Path(root, filename).relative_to(base_dir_path).as_posix()
+                             for filename in filenames if filename.endswith(CODE_EXTENSIONS))
+        for path in pathlib.Path(PROTOTYPES_DIR_PATH).glob('**/*.yml'):
+            paths.append(path.relative_to(base_dir_path).as_posix())
+        return sorted(paths)
+
+    # Пересканирует новые и изменённые файлы, удаляет пропавшие. Возвращает (изменённые, удалённые)
+    def update(self, jobs=None) -> typing.Tuple[typing.List[str], typing.List[str]]:
+        indexed = dict(self.conn.execute('SELECT path, hash FROM sources'))
+        current = self.get_source_files()
+
+        changed = []
+        for relative_path in current:
+            if indexed.get(relative_path) != get_file_hash(os.path.join(self.base_dir_path, relative_path)):
+                changed.append(relative_path)
+        removed = sorted(set(indexed) - set(current))
+
+        results = []
+        if changed:
+            tasks = [(self.base_dir_path, relative_path) for relative_path in changed]
+            if jobs == 1 or len(changed) == 1:
+                results = list(map(_scan_source_file_safe, tasks))
+            else:
+                with ProcessPoolExecutor(max_workers=jobs) as executor:
+                    results = list(executor.map(_scan_source_file_safe, tasks, chunksize=64))
+
+        with self.conn:
+            self.conn.executemany('DELETE FROM sources WHERE path = ?', [(path,) for path in removed + changed])
+            for result, error in results:
+                if error:
+                    logging.warning(f'Не удалось прочитать {error[0]}: {error[1]}')
+                    continue
+
+                relative_path, file_hash, keys, prefixes = result
+                self.conn.execute('INSERT INTO sources VALUES (?, ?, ?, ?)',
+                                  (relative_path, file_hash, json.dumps(keys), json.dumps(prefixes)))
+
+        return changed, removed
+
+    def get_references(self) -> SourceReferences:
+        references = SourceReferences(set(), set())
+        for keys, prefixes in self.conn.execute('SELECT keys, prefixes FROM sources'):
+            references.keys.update(json.loads(keys))
+            references.prefixes.update(json.loads(prefixes))
+        return references
+
+    # Файлы, в которых встречается префикс (для отладки слишком общих префиксов)
+    def get_prefix_sources(self, prefix) -> typing.List[str]:
+        return [path for path, prefixes in self.conn.execute('SELECT path, prefixes FROM sources ORDER BY path')
+                if prefix in json.loads(prefixes)]
+
+    def close(self):
+        self.conn.close()
+
+
+# Ссылки ключей Fluent друг на друга: { other-message }, { -term }, { message.attr }
+def add_fluent_references(records: typing.List[LocaleKeyRecord], references: SourceReferences):
+    for record in records:
+        for placeable in record.placeables:
+            if not placeable.startswith('$') and not placeable.endswith('()'):
+                references.keys.add(placeable.split('.', 1)[0])
+
+
+def is_referenced(key, references: SourceReferences):
+    if key in references.keys:
+        return True
+    # Проверяются все префиксы ключа: поиск по множеству вместо перебора префиксов
+    return any(key[:end] in references.prefixes for end in range(1, len(key)) if key[end - 1] == '-')
+
+
+def get_orphaned_keys(records: typing.List[LocaleKeyRecord], references: SourceReferences) -> typing.List[LocaleKeyRecord]:
+    return [record for record in records if not is_referenced(record.key, references)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Поиск ключей локализации, на которые нет ссылок в коде и прототипах')
+    parser.add_argument('--locale', default=DEFAULT_SOURCE_LOCALE, help='Проверяемая локаль')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='Путь к кешу ссылок')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='Количество процессов (по умолчанию - все ядра)')
+    parser.add_argument('--rebuild', action='store_true', help='Пересканировать все файлы')
+    parser.add_argument('--prefix-sources', metavar='PREFIX', help='Вывести файлы, в которых встречается префикс')
+    parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.rebuild and os.path.isfile(args.db):
+        os.remove(args.db)
+
+    reference_index = LocaleReferenceIndex(args.db)
+    changed, removed = reference_index.update(args.jobs)
+    logging.info(f'Пересканировано файлов: {len(changed)}, удалено: {len(removed)}')
+
+    if args.prefix_sources:
+        for path in reference_index.get_prefix_sources(args.prefix_sources):
+            print(path)
+        reference_index.close()
+        return 0
+
+    references = reference_index.get_references()
+    # $"ent-{id}" в коде не делает используемыми все ключи сущностей: они проверяются по id прототипов
+    references.prefixes.discard(ENTITY_KEY_PREFIX)
+    reference_index.close()
+
+    locale_index = LocaleIndex()
+    locale_index.update(args.jobs)
+    records = locale_index.get_all(args.locale)
+    add_fluent_references(records, references)
+    locale_index.close()
+
+    orphaned = get_orphaned_keys(records, references)
+    locale_dir_path = Project().get_locale_dir_path(args.locale)
+
+    if args.json:
+        print(json.dumps([record._asdict() for record in orphaned], ensure_ascii=False, indent=1))
+    else:
+        for record in orphaned:
+            print(f'{os.path.relpath(os.path.join(locale_dir_path, record.file), BASE_DIR_PATH)}:{record.line}: {record.key}')
+
+    logging.info(f'Ссылок: {len(references.keys)}, префиксов: {len(references.prefixes)}, '
+                 f'вероятно неиспользуемых ключей: {len(orphaned)} из {len(records)}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,16 +3,35 @@ import os
 import glob
 from file import FluentFile
 
+# Локаль-источник, из которой берутся ключи, и локали, которые по ней актуализируются. Другие локали
+# из Resources/Locale (например nl-NL) подключаются через target_locales / --targets
+DEFAULT_SOURCE_LOCALE = 'en-US'
+DEFAULT_TARGET_LOCALES = ['ru-RU']
+PROTOTYPES_LOCALE_DIR = '_prototypes'
+
+
 class Project:
-    def __init__(self):
-        self.base_dir_path = pathlib.Path(__file__).parents[3].resolve()
+    def __init__(self, source_locale=DEFAULT_SOURCE_LOCALE, target_locales=None):
+        self.base_dir_path = pathlib.Path(__file__).resolve().parents[3]
         self.resources_dir_path = os.path.join(self.base_dir_path, 'Resources')
         self.prototypes_dir_path = os.path.join(self.resources_dir_path, "Prototypes")
         self.locales_dir_path = os.path.join(self.resources_dir_path, 'Locale')
-        self.ru_locale_dir_path = os.path.join(self.locales_dir_path, 'ru-RU')
-        self.en_locale_dir_path = os.path.join(self.locales_dir_path, 'en-US')
-        self.en_locale_prototypes_dir_path = os.path.join(self.en_locale_dir_path, '_prototypes')
-        self.ru_locale_prototypes_dir_path = os.path.join(self.ru_locale_dir_path, '_prototypes')
+        self.source_locale = source_locale
+        self.target_locales = list(target_locales if target_locales is not None else DEFAULT_TARGET_LOCALES)
+        self.ru_locale_dir_path = self.get_locale_dir_path('ru-RU')
+        self.en_locale_dir_path = self.get_locale_dir_path('en-US')
+        self.en_locale_prototypes_dir_path = self.get_locale_prototypes_dir_path('en-US')
+        self.ru_locale_prototypes_dir_path = self.get_locale_prototypes_dir_path('ru-RU')
+
+    # Источник и все целевые локали, источник первым
+    def get_locales(self):
+        return [self.source_locale] + [locale for locale in self.target_locales if locale != self.source_locale]
+
+    def get_locale_dir_path(self, locale):
+        return os.path.join(self.locales_dir_path, locale)
+
+    def get_locale_prototypes_dir_path(self, locale):
+        return os.path.join(self.get_locale_dir_path(locale), PROTOTYPES_LOCALE_DIR)
 
     def get_files_paths_by_dir(self, dir_path, files_extension):
         return glob.glob(f'{dir_path}/**/*.{files_extension}', recursive=True)
@@ -28,4 +47,3 @@ class Project:
                 continue
 
         return files
-
@@ -1,107 +1,190 @@
+import argparse
+import hashlib
+import json
 import os
+import pathlib
 import logging
+import typing
 from fluent.syntax import ast
 from fluent.syntax.parser import FluentParser
 from fluent.syntax.serializer import FluentSerializer
-from file import YAMLFile, FluentFile
+from file import YAMLFile, FluentFileCache
 from fluentast import FluentSerializedMessage, FluentAstAttributeFactory
 from fluentformatter import FluentFormatter
-from project import Project
+from localeindex import LocaleIndex
+from project import Project, DEFAULT_SOURCE_LOCALE, DEFAULT_TARGET_LOCALES
 from tqdm import tqdm
 
+# Манифест последнего запуска: для каждого файла прототипов - хеш содержимого, путь сгенерированного .ftl
+# (относительно _prototypes локали) и ключи, которые из него получены. По нему обрабатываются только изменённые
+# файлы, а переводы ключей, переехавших из другого файла прототипов, ищутся в .ftl прежнего файла без сканирования локалей
+class LocaleManifest:
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+
+    @classmethod
+    def load(cls, path):
+        manifest = cls(path)
+        try:
+            with open(path, 'r', encoding='utf8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != cls.VERSION:
+            return None
+        manifest.files = data.get('files') or {}
+        return manifest
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf8') as file:
+            json.dump({'version': self.VERSION, 'files': self.files}, file, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def get_owners(self):
+        owners = {}
+        for relative_path, entry in self.files.items():
+            for key in entry['keys']:
+                owners.setdefault(key, entry['output'])
+        return owners
+
+
+def get_file_hash(file_path):
+    with open(file_path, 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
 class YAMLExtractor:
-    def __init__(self, yaml_files):
+    def __init__(self, yaml_files, manifest: LocaleManifest = None):
         self.yaml_files = yaml_files
         self.existing_ids_by_locale = {}
         self.entries_to_remove = []
+        self.fluent_cache = FluentFileCache(parser)
+        self.manifest = manifest
 
+    # Расположение ключей берётся из индекса локалей (переразбираются только изменённые файлы), а сами файлы
+    # разбираются кешем лениво - только те, из которых действительно переносятся переводы
     def scan_existing_locale_files(self):
-        locales = self.get_locales_from_dir(project.locales_dir_path)
-        for locale in tqdm(locales, desc="Сканирование локалей"):
+        locale_index = LocaleIndex()
+        locale_index.update()
+        for locale in self.get_locales_from_dir(project.locales_dir_path):
             self.existing_ids_by_locale[locale] = {}
             locale_dir_path = os.path.join(project.locales_dir_path, locale)
-            fluent_files = project.get_fluent_files_by_dir(locale_dir_path)
-            for fluent_file in tqdm(fluent_files, desc=f"Обработка файлов в {locale}", leave=False):
-                self.collect_existing_ids(fluent_file.full_path, locale)
-
-    def collect_existing_ids(self, fluent_file_path, locale):
-        fluent_file = FluentFile(fluent_file_path)
-        data = fluent_file.read_data()
-        parsed = parser.parse(data)
-        for entry in parsed.body:
-            if isinstance(entry, ast.Message):
-                if entry.id.name in self.existing_ids_by_locale[locale]:
-                    self.existing_ids_by_locale[locale][entry.id.name].append(fluent_file_path)
-                else:
-                    self.existing_ids_by_locale[locale][entry.id.name] = [fluent_file_path]
+            for record in locale_index.get_all(locale):
+                if record.kind == 'message':
+                    fluent_file_path = os.path.join(locale_dir_path, record.file)
+                    self.existing_ids_by_locale[locale].setdefault(record.key, []).append(fluent_file_path)
+        locale_index.close()
 
     def get_locales_from_dir(self, locales_dir_path):
         return [name for name in os.listdir(locales_dir_path)
                 if os.path.isdir(os.path.join(locales_dir_path, name))]
 
     def get_correct_path_for_entry(self, entry_id, locale, relative_parent_dir, file_name):
-        locale_attr = f'{locale.split("-")[0]}_locale_prototypes_dir_path'
-        return os.path.join(getattr(project, locale_attr), relative_parent_dir, f'{file_name}.ftl')
+        return os.path.join(project.get_locale_prototypes_dir_path(locale), relative_parent_dir, f'{file_name}.ftl')
 
     def remove_entry_from_file(self, file_path, entry_id):
-        fluent_file = FluentFile(file_path)
-        data = fluent_file.read_data()
-        parsed = parser.parse(data)
+        parsed = self.fluent_cache.get(file_path)
         parsed.body = [e for e in parsed.body if not (isinstance(e, ast.Message) and e.id.name == entry_id)]
-        fluent_file.save_data(serializer.serialize(parsed))
+        self.fluent_cache.mark_dirty(file_path)
         rel_path = os.path.relpath(file_path, project.base_dir_path)
         logging.debug(f'Удален дублирующийся элемент {entry_id} из {rel_path}')
 
-    def execute(self):
-        self.scan_existing_locale_files()
+    # Вместо сканирования локалей: каждый ключ из манифеста считается лежащим в .ftl файла прототипов, который его создал
+    def collect_existing_ids_from_manifest(self):
+        owners = self.manifest.get_owners()
+        for locale in project.get_locales():
+            locale_dir_path = project.get_locale_prototypes_dir_path(locale)
+            self.existing_ids_by_locale[locale] = {key: [os.path.join(locale_dir_path, output)] for key, output in owners.items()}
+
+    def get_changed_yaml_files(self, hashes):
+        return [yaml_file for yaml_file in self.yaml_files
+                if self.manifest.files.get(self.get_manifest_key(yaml_file), {}).get('hash') != hashes[yaml_file.full_path]]
+
+    def get_manifest_key(self, yaml_file):
+        return pathlib.Path(yaml_file.get_relative_path(project.prototypes_dir_path)).as_posix()
+
+    # full = True - обработка всех файлов со сканированием локалей; иначе только файлы, изменённые с прошлого запуска.
+    # Без манифеста запуск всегда полный
+    def execute(self, full=True):
+        hashes = {yaml_file.full_path: get_file_hash(yaml_file.full_path) for yaml_file in self.yaml_files}
+        full = full or self.manifest is None
+
+        if full:
+            self.scan_existing_locale_files()
+            yaml_files = self.yaml_files
+        else:
+            yaml_files = self.get_changed_yaml_files(hashes)
+            logging.info(f'Изменённых файлов прототипов: {len(yaml_files)}')
+            self.collect_existing_ids_from_manifest()
 
-        for yaml_file in tqdm(self.yaml_files, desc="Обработка YAML файлов"):
+        manifest_files = {}
+        for yaml_file in tqdm(yaml_files, desc="Обработка YAML файлов"):
             yaml_elements = yaml_file.get_elements(yaml_file.parse_data(yaml_file.read_data()))
 
+            relative_parent_dir = yaml_file.get_relative_parent_dir(project.prototypes_dir_path).lower()
+            file_name = yaml_file.get_name()
+            manifest_files[self.get_manifest_key(yaml_file)] = {
+                'hash': hashes[yaml_file.full_path],
+                'output': os.path.join(relative_parent_dir, f'{file_name}.ftl'),
+                'keys': [FluentSerializedMessage.get_key(el.id) for el in yaml_elements],
+            }
+
             if not len(yaml_elements):
                 continue
 
-            fluent_file_serialized = self.get_serialized_fluent_from_yaml_elements(yaml_elements)
+            fluent_resource = self.get_fluent_resource_from_yaml_elements(yaml_elements)
 
-            if not fluent_file_serialized:
+            if not fluent_resource:
                 continue
 
-            pretty_fluent_file_serialized = formatter.format_serialized_file_data(fluent_file_serialized)
-
-            relative_parent_dir = yaml_file.get_relative_parent_dir(project.prototypes_dir_path).lower()
-            file_name = yaml_file.get_name()
-
-            self.create_or_update_fluent_file(relative_parent_dir, file_name, pretty_fluent_file_serialized, 'en-US')
-            self.create_or_update_fluent_file(relative_parent_dir, file_name, pretty_fluent_file_serialized, 'ru-RU')
+            # Сообщения собраны сразу в AST; разбирать текст нужно, только если форматтер склеил строки разметки.
+            # Каждая локаль получает свою копию узлов
+            serialized = formatter.serialize(fluent_resource)
+            pretty_fluent_file_serialized = formatter.join_markup_lines(serialized)
+            parsed_new = fluent_resource if pretty_fluent_file_serialized == serialized else parser.parse(pretty_fluent_file_serialized)
+            for locale in project.get_locales():
+                self.create_or_update_fluent_file(relative_parent_dir, file_name, parsed_new.clone(), locale)
 
         if self.entries_to_remove:
             for path, entry_id in tqdm(self.entries_to_remove, desc="Удаление дублей"):
                 self.remove_entry_from_file(path, entry_id)
 
-    def get_serialized_fluent_from_yaml_elements(self, yaml_elements):
-        fluent_serialized_messages = []
+        # Все изменения до этого момента вносились в AST в памяти, каждый изменённый файл записывается один раз
+        written = self.fluent_cache.flush(serializer)
+        logging.info(f'Записано файлов локали: {len(written)}')
+
+        if self.manifest is not None:
+            existing_keys = {self.get_manifest_key(yaml_file) for yaml_file in self.yaml_files}
+            files = {} if full else {key: entry for key, entry in self.manifest.files.items() if key in existing_keys}
+            files.update(manifest_files)
+            self.manifest.files = files
+            self.manifest.save()
+
+    def get_fluent_resource_from_yaml_elements(self, yaml_elements) -> typing.Optional[ast.Resource]:
+        entries = []
 
         for el in tqdm(yaml_elements, desc="Обработка YAML элементов", leave=False):
             if isinstance(el.parent_id, list):
                 el.parent_id = el.parent_id[0]
 
-            fluent_message = FluentSerializedMessage.from_yaml_element(el.id, el.name, FluentAstAttributeFactory.from_yaml_element(el), el.parent_id)
-            if fluent_message:
-                fluent_serialized_messages.append(fluent_message)
+            entries.extend(FluentSerializedMessage.to_ast_entries(el.id, el.name, FluentAstAttributeFactory.from_yaml_element(el), el.parent_id))
 
-        if not fluent_serialized_messages:
+        if not entries:
             return None
 
-        return '\n'.join(fluent_serialized_messages)
+        return ast.Resource(body=entries)
 
-    def create_or_update_fluent_file(self, relative_parent_dir, file_name, file_data, locale):
-        locale_attr = f'{locale.split("-")[0]}_locale_prototypes_dir_path'
-        new_dir_path = os.path.join(getattr(project, locale_attr), relative_parent_dir)
+    def create_or_update_fluent_file(self, relative_parent_dir, file_name, parsed_new: ast.Resource, locale):
+        new_dir_path = os.path.join(project.get_locale_prototypes_dir_path(locale), relative_parent_dir)
         os.makedirs(new_dir_path, exist_ok=True)
 
         fluent_file_path = os.path.join(new_dir_path, f'{file_name}.ftl')
 
-        parsed_new = parser.parse(file_data)
         new_entries = {}
 
         for entry in parsed_new.body:
@@ -114,9 +197,9 @@ class YAMLExtractor:
                     for existing_path in existing_paths:
                         if existing_path != fluent_file_path:
                             try:
-                                existing_file = FluentFile(existing_path)
-                                existing_data = existing_file.read_data()
-                                existing_parsed = parser.parse(existing_data)
+                                existing_parsed = self.fluent_cache.get(existing_path)
+                                if existing_parsed is None:
+                                    continue
 
                                 for existing_entry in existing_parsed.body:
                                     if isinstance(existing_entry, ast.Message) and existing_entry.id.name == entry_id:
@@ -142,48 +225,59 @@ class YAMLExtractor:
                     logging.debug(f'Для сущности {entry_id} используется существующий перевод')
 
         new_body = list(new_entries.values())
-        file_data = serializer.serialize(ast.Resource(body=new_body))
 
         rel_path = os.path.relpath(fluent_file_path, project.base_dir_path)
-        if os.path.isfile(fluent_file_path):
+        if self.fluent_cache.get(fluent_file_path) is not None:
             logging.debug(f'Обновление существующего файла локали {locale} {rel_path}')
-            self.update_fluent_file(fluent_file_path, file_data)
+            self.update_fluent_file(fluent_file_path, new_body)
         else:
-            fluent_file = FluentFile(fluent_file_path)
-            fluent_file.save_data(file_data)
+            self.fluent_cache.set(fluent_file_path, ast.Resource(body=new_body))
             logging.debug(f'Создан файл локали {locale} {rel_path}')
 
         return fluent_file_path
 
-    def update_fluent_file(self, fluent_file_path, new_data):
-        fluent_file = FluentFile(fluent_file_path)
-        existing_data = fluent_file.read_data()
-
-        existing_parsed = parser.parse(existing_data)
-        new_parsed = parser.parse(new_data)
+    def update_fluent_file(self, fluent_file_path, new_body):
+        existing_parsed = self.fluent_cache.get(fluent_file_path)
 
         existing_entries = {entry.id.name: entry for entry in existing_parsed.body if isinstance(entry, ast.Message)}
-        new_entries = {entry.id.name: entry for entry in new_parsed.body if isinstance(entry, ast.Message)}
+        new_entries = {entry.id.name: entry for entry in new_body if isinstance(entry, ast.Message)}
 
         # Merge new entries into existing entries, giving priority to existing entries
         merged_entries = {**new_entries, **existing_entries}
 
-        # Serialize the merged entries back to the file
-        merged_parsed = ast.Resource(body=list(merged_entries.values()))
-        fluent_file.save_data(serializer.serialize(merged_parsed))
+        # The merged file is written once by FluentFileCache.flush at the end of the run
+        self.fluent_cache.set(fluent_file_path, ast.Resource(body=list(merged_entries.values())))
 
-logging.basicConfig(level=logging.INFO)
 project = Project()
 serializer = FluentSerializer()
 parser = FluentParser()
 formatter = FluentFormatter()
-
-logging.info('Searching for YAML files...')
-yaml_files_paths = project.get_files_paths_by_dir(project.prototypes_dir_path, 'yml')
-if not yaml_files_paths:
-    logging.info("No YAML files found!")
-else:
-    logging.info(f"Found {len(yaml_files_paths)} YAML files. Processing...")
-yaml_files = list(map(lambda yaml_file_path: YAMLFile(yaml_file_path), yaml_files_paths))
-
-YAMLExtractor(yaml_files).execute()
+MANIFEST_PATH = os.path.join(project.base_dir_path, 'Tools', '_sunrise', '.cache', 'locale_manifest.json')
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Генерация ключей локализации прототипов')
+    arg_parser.add_argument('--full', action='store_true', help='Обработать все файлы прототипов и просканировать локали')
+    arg_parser.add_argument('--manifest', default=MANIFEST_PATH, help='Путь к манифесту предыдущего запуска')
+    arg_parser.add_argument('--source', default=DEFAULT_SOURCE_LOCALE, help='Локаль-источник')
+    arg_parser.add_argument('--targets', nargs='+', default=DEFAULT_TARGET_LOCALES, help='Целевые локали')
+    args = arg_parser.parse_args()
+
+    project = Project(args.source, args.targets)
+
+    logging.basicConfig(level=logging.INFO)
+
+    # Раньше целевые файлы форматировались побочным эффектом импорта fluentformatter, теперь - явно, как в keyfinder
+    logging.info('Formatting target locale files...')
+    for locale in project.target_locales:
+        FluentFormatter.format(project.get_fluent_files_by_dir(project.get_locale_dir_path(locale)))
+
+    logging.info('Searching for YAML files...')
+    yaml_files_paths = project.get_files_paths_by_dir(project.prototypes_dir_path, 'yml')
+    if not yaml_files_paths:
+        logging.info("No YAML files found!")
+    else:
+        logging.info(f"Found {len(yaml_files_paths)} YAML files. Processing...")
+    yaml_files = list(map(lambda yaml_file_path: YAMLFile(yaml_file_path), yaml_files_paths))
+
+    manifest = LocaleManifest.load(args.manifest) or LocaleManifest(args.manifest)
+    YAMLExtractor(yaml_files, manifest).execute(full=args.full or not manifest.files)
@@ -1,3 +1,6 @@
+from protoloader import scalar_to_str
+
+
 class YAMLEntity:
     def __init__(self, id, name, description, suffix, parent_id = None):
         self.id = id
@@ -16,9 +19,10 @@ class YAMLElements:
             return None
 
         if item['type'] == 'entity':
-            entity = YAMLEntity(item['id'], item['name'] if 'name' in item else None,
-                                item['description'] if 'description' in item else None,
-                                item['suffix'] if 'suffix' in item else None,
+            # Загрузчик сохраняет типы скаляров, а в локализацию текстовые поля попадают строками
+            entity = YAMLEntity(scalar_to_str(item['id']), scalar_to_str(item.get('name')),
+                                scalar_to_str(item.get('description')),
+                                scalar_to_str(item.get('suffix')),
                                 item['parent'] if 'parent' in item else None
                                 )
             return entity
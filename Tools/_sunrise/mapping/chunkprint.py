@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+
+# Отпечатки чанков карт для инкрементального рендера.
+# build - считает стабильный отпечаток каждого чанка грида (тайлы, декали и сущности, чей Transform pos попадает
+#         в чанк) и пишет манифест рядом с картой (<карта>.chunks.json). Остальные компоненты самого грида или карты
+#         сводятся в отпечаток грида (roots): при его изменении грязными считаются все чанки грида.
+#         Сущности, стоящие прямо на карте, а не на гриде, попадают в чанки карты (<uid карты>/x,y); сущности,
+#         которые не удалось привязать ни к гриду, ни к карте или у привязки которых нет pos, перечисляются в unanchored
+# diff  - сравнивает два манифеста и выводит список изменённых чанков, которые нужно перерисовать
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import typing
+
+from mapfile import MapFile, MapEntity, get_grid_chunks, get_chunk_index, get_map_files_paths, parse_vector, \
+    DEFAULT_CHUNK_SIZE
+from protoloader import to_plain
+
+MANIFEST_VERSION = 4
+MANIFEST_SUFFIX = '.chunks.json'
+
+
+def get_chunk_key(grid_uid, chunk_index):
+    return f'{grid_uid}/{chunk_index[0]},{chunk_index[1]}'
+
+
+def get_digest(value):
+    payload = json.dumps(to_plain(value), sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(payload.encode('utf8')).hexdigest()
+
+
+def get_entity_digest(entity: MapEntity):
+    # uid не входит в отпечаток: при пересохранении карты сущности перенумеровываются
+    return get_digest([entity.proto, entity.components])
+
+
+# Декали DecalGrid (chunkCollection с nodes): общие свойства узла (id, цвет, угол) и позиции его декалей.
+# Возвращает пары (позиция, отпечаток декали) или None, если формат не распознан
+def get_decals(decal_grid: dict) -> typing.Optional[typing.List[typing.Tuple[typing.Tuple[float, float], str]]]:
+    collection = decal_grid.get('chunkCollection')
+    if not isinstance(collection, dict) or not isinstance(collection.get('nodes'), list):
+        return None
+
+    decals = []
+    for node in collection['nodes']:
+        properties = node.get('node')
+        # id декали, как и uid сущности, в отпечаток не входит
+        for position in (node.get('decals') or {}).values():
+            decals.append((parse_vector(position), get_digest([properties, position])))
+    return decals
+
+
+def get_grid_anchor(uid, parents, roots, anchors):
+    # Сущность в контейнере или прикреплённая к другой сущности относится к чанку предка, стоящего на гриде или карте
+    chain = []
+    current = uid
+    while current is not None and current not in anchors:
+        parent = parents.get(current)
+        if parent in roots:
+            anchors[current] = current
+            break
+        if current in chain:
+            anchors[current] = None
+            break
+        chain.append(current)
+        current = parent
+
+    anchor = anchors.get(current) if current is not None else None
+    for item in chain:
+        anchors[item] = anchor
+    return anchor
+
+
+def build_manifest(map_file: MapFile):
+    entities = map_file.get_entities()
+    entities_by_uid = {entity.uid: entity for entity in entities}
+    grids = map_file.get_grids()
+    # Карта с MapGrid (планета) считается гридом
+    maps = {entity.uid for entity in entities if entity.get_component('Map') is not None and entity.uid not in grids}
+    roots = maps | grids.keys()
+    parents = {entity.uid: entity.get_parent() for entity in entities}
+
+    tiles_by_chunk = {}
+    chunk_sizes = {}
+    for grid_uid, map_grid in grids.items():
+        chunk_sizes[grid_uid] = map_grid.get('chunkSize', DEFAULT_CHUNK_SIZE)
+        for chunk_index, chunk in get_grid_chunks(map_grid).items():
+            tiles_by_chunk[get_chunk_key(grid_uid, chunk_index)] = f'{chunk.get("version", "")}:{chunk.get("tiles", "")}'
+
+    # Декали раскладываются по чанкам, остальные компоненты грида или карты входят в отпечаток грида
+    contents_by_chunk: typing.Dict[str, typing.List[str]] = {}
+    roots_digests = {}
+    for root_uid in sorted(roots):
+        root = entities_by_uid[root_uid]
+        chunk_size = chunk_sizes.get(root_uid, DEFAULT_CHUNK_SIZE)
+        components = []
+        for component in root.components:
+            if component.get('type') == 'MapGrid':
+                component = {key: value for key, value in component.items() if key != 'chunks'}
+            elif component.get('type') == 'DecalGrid':
+                decals = get_decals(component)
+                if decals is not None:
+                    component = {key: value for key, value in component.items() if key != 'chunkCollection'}
+                    for pos, decal_digest in decals:
+                        chunk_key = get_chunk_key(root_uid, get_chunk_index(pos, chunk_size))
+                        contents_by_chunk.setdefault(chunk_key, []).append(decal_digest)
+            components.append(component)
+        roots_digests[str(root_uid)] = get_digest([root.proto, components])
+
+    anchors = {}
+    unanchored = []
+    for entity in entities:
+        if entity.uid in roots:
+            continue
+
+        anchor_uid = get_grid_anchor(entity.uid, parents, roots, anchors)
+        if anchor_uid is None:
+            unanchored.append(entity.uid)
+            continue
+
+        pos = entities_by_uid[anchor_uid].get_pos()
+        if pos is None:
+            unanchored.append(entity.uid)
+            continue
+
+        root_uid = parents[anchor_uid]
+        chunk_key = get_chunk_key(root_uid, get_chunk_index(pos, chunk_sizes.get(root_uid, DEFAULT_CHUNK_SIZE)))
+        contents_by_chunk.setdefault(chunk_key, []).append(get_entity_digest(entity))
+
+    chunks = {}
+    for chunk_key in sorted(set(tiles_by_chunk) | set(contents_by_chunk)):
+        digest = hashlib.sha1()
+        digest.update(tiles_by_chunk.get(chunk_key, '').encode('utf8'))
+        for content_digest in sorted(contents_by_chunk.get(chunk_key, [])):
+            digest.update(content_digest.encode('ascii'))
+        chunks[chunk_key] = digest.hexdigest()
+
+    return {
+        'version': MANIFEST_VERSION,
+        'map': map_file.get_relative_path(),
+        'chunks': chunks,
+        'roots': roots_digests,
+        'unanchored': sorted(unanchored),
+    }
+
+
+def get_manifest_path(map_path, output_dir=None):
+    manifest_name = os.path.splitext(os.path.basename(map_path))[0] + MANIFEST_SUFFIX
+    return os.path.join(output_dir or os.path.dirname(map_path), manifest_name)
+
+
+def read_manifest(path):
+    with open(path, 'r', encoding='utf8') as file:
+        manifest = json.load(file)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f'Неподдерживаемая версия манифеста {path}: {manifest.get("version")}')
+    return manifest
+
+
+def write_manifest(path, manifest):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf8') as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+        file.write('\n')
+
+
+# Чанк грязный, если его отпечаток изменился, он появился/пропал в одном из манифестов
+# или изменился отпечаток его грида
+def get_dirty_chunks(old_manifest, new_manifest) -> typing.List[str]:
+    old_chunks = old_manifest.get('chunks', {})
+    new_chunks = new_manifest.get('chunks', {})
+    dirty = {key for key in old_chunks.keys() | new_chunks.keys() if old_chunks.get(key) != new_chunks.get(key)}
+
+    old_roots = old_manifest.get('roots', {})
+    new_roots = new_manifest.get('roots', {})
+    for root_uid in old_roots.keys() | new_roots.keys():
+        if old_roots.get(root_uid) != new_roots.get(root_uid):
+            prefix = f'{root_uid}/'
+            dirty.update(key for key in old_chunks.keys() | new_chunks.keys() if key.startswith(prefix))
+
+    return sorted(dirty)
+
+
+def build(args):
+    for map_path in get_map_files_paths(args.maps):
+        manifest_path = get_manifest_path(map_path, args.output_dir)
+        manifest = build_manifest(MapFile(map_path))
+        write_manifest(manifest_path, manifest)
+        print(f'{map_path}: {len(manifest["chunks"])} чанков -> {manifest_path}')
+        if manifest['unanchored']:
+            print(f'  Не привязаны к чанку ({len(manifest["unanchored"])}): '
+                  + ', '.join(map(str, manifest['unanchored'])))
+    return 0
+
+
+def diff(args):
+    dirty = get_dirty_chunks(read_manifest(args.old), read_manifest(args.new))
+    if args.json:
+        json.dump(dirty, sys.stdout)
+        sys.stdout.write('\n')
+    else:
+        for chunk_key in dirty:
+            print(chunk_key)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Отпечатки чанков карт для инкрементального рендера')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Посчитать отпечатки чанков и записать манифесты')
+    build_parser.add_argument('maps', nargs='+', help='Файлы карт или каталоги с картами')
+    build_parser.add_argument('--output-dir', help='Каталог для манифестов (по умолчанию - рядом с картой)')
+    build_parser.set_defaults(func=build)
+
+    diff_parser = subparsers.add_parser('diff', help='Вывести изменённые чанки между двумя манифестами')
+    diff_parser.add_argument('old', help='Старый манифест')
+    diff_parser.add_argument('new', help='Новый манифест')
+    diff_parser.add_argument('--json', action='store_true', help='Вывести список чанков в JSON')
+    diff_parser.set_defaults(func=diff)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import hashlib
+import math
+import pathlib
+import pickle
+import os
+import sys
+import typing
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'prototypes'))
+from protoloader import load as load_yaml
+
+# Размер чанка грида в тайлах (MapGridComponent.ChunkSize по умолчанию)
+DEFAULT_CHUNK_SIZE = 16
+
+BASE_DIR_PATH = pathlib.Path(__file__).resolve().parents[3]
+MAPS_DIR_PATH = os.path.join(BASE_DIR_PATH, 'Resources', 'Maps')
+CACHE_DIR_PATH = os.path.join(BASE_DIR_PATH, 'Tools', '_sunrise', '.cache', 'maps')
+# Меняется при изменении формата разобранных данных, чтобы не читать устаревший кеш
+CACHE_VERSION = 2
+
+
+class MapEntity:
+    def __init__(self, uid, proto, components):
+        self.uid = uid
+        self.proto = proto
+        self.components = components
+
+    def get_component(self, component_type):
+        for component in self.components:
+            if component.get('type') == component_type:
+                return component
+        return None
+
+    def get_parent(self):
+        transform = self.get_component('Transform')
+        if not transform:
+            return None
+        parent = transform.get('parent')
+        return parent if isinstance(parent, int) else None
+
+    def get_pos(self) -> typing.Optional[typing.Tuple[float, float]]:
+        transform = self.get_component('Transform')
+        if not transform or 'pos' not in transform:
+            return None
+        return parse_vector(transform['pos'])
+
+
+class MapFile:
+    def __init__(self, full_path, use_cache=True):
+        self.full_path = full_path
+        self.use_cache = use_cache
+        self.data = None
+
+    def read_data(self):
+        with open(self.full_path, 'r', encoding='utf8') as file:
+            return file.read()
+
+    def parse_data(self, file_data: typing.AnyStr):
+        return load_yaml(file_data)
+
+    def load(self):
+        if self.data is not None:
+            return self.data
+
+        if not self.use_cache:
+            self.data = self.parse_data(self.read_data())
+            return self.data
+
+        # Разобранная карта кешируется по хешу содержимого, чтобы повторные запуски не разбирали YAML заново
+        with open(self.full_path, 'rb') as file:
+            raw_data = file.read()
+        cache_path = os.path.join(CACHE_DIR_PATH, f'{hashlib.sha1(raw_data).hexdigest()}.v{CACHE_VERSION}.pickle')
+
+        if os.path.isfile(cache_path):
+            try:
+                with open(cache_path, 'rb') as cache_file:
+                    self.data = pickle.load(cache_file)
+                return self.data
+            except (OSError, pickle.UnpicklingError, EOFError):
+                pass
+
+        self.data = self.parse_data(raw_data.decode('utf8'))
+        os.makedirs(CACHE_DIR_PATH, exist_ok=True)
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as cache_file:
+            pickle.dump(self.data, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+
+        return self.data
+
+    def get_relative_path(self, base_path=MAPS_DIR_PATH):
+        return os.path.relpath(self.full_path, base_path)
+
+    def get_entities(self) -> typing.List[MapEntity]:
+        entities = []
+        for proto_group in self.load().get('entities') or []:
+            proto = proto_group.get('proto') or ''
+            for entity in proto_group.get('entities') or []:
+                entities.append(MapEntity(entity['uid'], proto, entity.get('components') or []))
+        return entities
+
+    # Возвращает компоненты MapGrid, сгруппированные по uid грида
+    def get_grids(self) -> typing.Dict[int, dict]:
+        grids = {}
+        for entity in self.get_entities():
+            map_grid = entity.get_component('MapGrid')
+            if map_grid is not None:
+                grids[entity.uid] = map_grid
+        return grids
+
+
+# Vector2 в картах записывается строкой "x,y"
+def parse_vector(value) -> typing.Tuple[float, float]:
+    x, y = str(value).split(',', maxsplit=1)
+    return float(x), float(y)
+
+
+def get_grid_chunks(map_grid: dict) -> typing.Dict[typing.Tuple[int, int], dict]:
+    # Формат 6+ хранит чанки словарём, старые карты - списком
+    chunks = map_grid.get('chunks') or {}
+    chunk_list = chunks.values() if isinstance(chunks, dict) else chunks
+    result = {}
+    for chunk in chunk_list:
+        x, y = str(chunk['ind']).split(',', maxsplit=1)
+        result[(int(x), int(y))] = chunk
+    return result
+
+
+def get_chunk_index(pos: typing.Tuple[float, float], chunk_size=DEFAULT_CHUNK_SIZE) -> typing.Tuple[int, int]:
+    return math.floor(pos[0] / chunk_size), math.floor(pos[1] / chunk_size)
+
+
+def get_map_files_paths(paths: typing.Iterable[str]) -> typing.List[str]:
+    files_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            files_paths.extend(str(p) for p in sorted(pathlib.Path(path).rglob('*.yml')))
+        else:
+            files_paths.append(path)
+    return files_paths
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+# Пространственный индекс позиций сущностей карты.
+# Сущности раскладываются по ячейкам равномерной сетки отдельно для каждого родителя (грида),
+# что позволяет делать запросы по радиусу и поиск ближайших соседей без перебора всех сущностей.
+# Разобранные карты берутся из кеша MapFile, поэтому повторные запросы не разбирают YAML заново.
+
+import argparse
+import heapq
+import math
+import sys
+import typing
+
+from mapfile import MapFile, get_grid_chunks, get_chunk_index, DEFAULT_CHUNK_SIZE
+
+
+class SpatialEntity(typing.NamedTuple):
+    uid: int
+    proto: str
+    parent: int
+    x: float
+    y: float
+
+    def distance_to(self, x, y):
+        return math.hypot(self.x - x, self.y - y)
+
+
+class GridIndex:
+    def __init__(self, cell_size=DEFAULT_CHUNK_SIZE):
+        self.cell_size = cell_size
+        self.cells: typing.Dict[typing.Tuple[int, int], typing.List[SpatialEntity]] = {}
+        self.min_cell = None
+        self.max_cell = None
+
+    def get_cell(self, x, y):
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def insert(self, entity: SpatialEntity):
+        cell = self.get_cell(entity.x, entity.y)
+        self.cells.setdefault(cell, []).append(entity)
+
+        if self.min_cell is None:
+            self.min_cell = cell
+            self.max_cell = cell
+        else:
+            self.min_cell = (min(self.min_cell[0], cell[0]), min(self.min_cell[1], cell[1]))
+            self.max_cell = (max(self.max_cell[0], cell[0]), max(self.max_cell[1], cell[1]))
+
+    def __iter__(self):
+        for entities in self.cells.values():
+            yield from entities
+
+    def __len__(self):
+        return sum(len(entities) for entities in self.cells.values())
+
+    def query_range(self, x, y, radius, predicate=None) -> typing.List[typing.Tuple[float, SpatialEntity]]:
+        min_cx, min_cy = self.get_cell(x - radius, y - radius)
+        max_cx, max_cy = self.get_cell(x + radius, y + radius)
+
+        result = []
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                for entity in self.cells.get((cx, cy), ()):
+                    if predicate and not predicate(entity):
+                        continue
+                    distance = entity.distance_to(x, y)
+                    if distance <= radius:
+                        result.append((distance, entity))
+
+        result.sort(key=lambda item: (item[0], item[1].uid))
+        return result
+
+    # Обходит ячейки кольцами вокруг точки, пока следующее кольцо не может содержать сущность ближе k-й найденной
+    def nearest(self, x, y, k=1, predicate=None) -> typing.List[typing.Tuple[float, SpatialEntity]]:
+        if not self.cells or k <= 0:
+            return []
+
+        center_cx, center_cy = self.get_cell(x, y)
+        max_ring = max(abs(center_cx - self.min_cell[0]), abs(center_cx - self.max_cell[0]),
+                       abs(center_cy - self.min_cell[1]), abs(center_cy - self.max_cell[1]))
+
+        # Куча с отрицательными расстояниями хранит k лучших кандидатов
+        best: typing.List[typing.Tuple[float, int, SpatialEntity]] = []
+        for ring in range(max_ring + 1):
+            if len(best) == k:
+                ring_distance = (ring - 1) * self.cell_size
+                if ring_distance > -best[0][0]:
+                    break
+
+            for cell in self.get_ring_cells(center_cx, center_cy, ring):
+                for entity in self.cells.get(cell, ()):
+                    if predicate and not predicate(entity):
+                        continue
+                    item = (-entity.distance_to(x, y), -entity.uid, entity)
+                    if len(best) < k:
+                        heapq.heappush(best, item)
+                    elif item > best[0]:
+                        heapq.heapreplace(best, item)
+
+        return sorted(((-distance, entity) for distance, _, entity in best), key=lambda item: (item[0], item[1].uid))
+
+    @staticmethod
+    def get_ring_cells(center_cx, center_cy, ring):
+        if ring == 0:
+            yield center_cx, center_cy
+            return
+
+        for dx in range(-ring, ring + 1):
+            yield center_cx + dx, center_cy - ring
+            yield center_cx + dx, center_cy + ring
+        for dy in range(-ring + 1, ring):
+            yield center_cx - ring, center_cy + dy
+            yield center_cx + ring, center_cy + dy
+
+
+class SpatialIndex:
+    def __init__(self, map_file: MapFile, cell_size=DEFAULT_CHUNK_SIZE):
+        self.map_file = map_file
+        self.cell_size = cell_size
+        self.indexes: typing.Dict[int, GridIndex] = {}
+        self.grids = map_file.get_grids()
+
+        for entity in map_file.get_entities():
+            parent = entity.get_parent()
+            pos = entity.get_pos()
+            if parent is None or pos is None:
+                continue
+
+            if parent not in self.indexes:
+                self.indexes[parent] = GridIndex(cell_size)
+            self.indexes[parent].insert(SpatialEntity(entity.uid, entity.proto, parent, pos[0], pos[1]))
+
+    def get_index(self, parent_uid) -> GridIndex:
+        return self.indexes.get(parent_uid) or GridIndex(self.cell_size)
+
+    # Грид по умолчанию - тот, на котором больше всего сущностей
+    def get_main_grid(self):
+        grids = [uid for uid in self.grids if uid in self.indexes]
+        if not grids:
+            return None
+        return max(grids, key=lambda uid: len(self.indexes[uid]))
+
+    def query_range(self, parent_uid, x, y, radius, protos=None):
+        return self.get_index(parent_uid).query_range(x, y, radius, self.get_proto_predicate(protos))
+
+    def nearest(self, parent_uid, x, y, k=1, protos=None):
+        return self.get_index(parent_uid).nearest(x, y, k, self.get_proto_predicate(protos))
+
+    # Сущности грида, чья позиция попадает в чанк, отсутствующий в MapGrid
+    def get_entities_outside_chunks(self) -> typing.List[SpatialEntity]:
+        result = []
+        for grid_uid, map_grid in self.grids.items():
+            chunk_size = map_grid.get('chunkSize', DEFAULT_CHUNK_SIZE)
+            chunks = get_grid_chunks(map_grid)
+            for entity in self.get_index(grid_uid):
+                if get_chunk_index((entity.x, entity.y), chunk_size) not in chunks:
+                    result.append(entity)
+
+        result.sort(key=lambda entity: (entity.parent, entity.uid))
+        return result
+
+    @staticmethod
+    def get_proto_predicate(protos):
+        if not protos:
+            return None
+        protos = set(protos)
+        return lambda entity: entity.proto in protos
+
+
+def format_entity(entity: SpatialEntity, distance=None):
+    line = f'{entity.uid}\t{entity.proto or "-"}\t{entity.parent}\t{entity.x:g},{entity.y:g}'
+    if distance is not None:
+        line += f'\t{distance:.2f}'
+    return line
+
+
+def get_parent_uid(index: SpatialIndex, args):
+    parent_uid = args.grid if args.grid is not None else index.get_main_grid()
+    if parent_uid is None:
+        raise SystemExit('На карте нет гридов с сущностями, укажите --grid')
+    return parent_uid
+
+
+def near(args):
+    index = SpatialIndex(MapFile(args.map))
+    for distance, entity in index.query_range(get_parent_uid(index, args), args.x, args.y, args.radius, args.proto):
+        print(format_entity(entity, distance))
+    return 0
+
+
+def nearest(args):
+    index = SpatialIndex(MapFile(args.map))
+    for distance, entity in index.nearest(get_parent_uid(index, args), args.x, args.y, args.k, args.proto):
+        print(format_entity(entity, distance))
+    return 0
+
+
+def outside_chunks(args):
+    index = SpatialIndex(MapFile(args.map))
+    entities = index.get_entities_outside_chunks()
+    for entity in entities:
+        print(format_entity(entity))
+    return 1 if entities and args.strict else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Пространственные запросы по сущностям карты')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_point_arguments(subparser):
+        subparser.add_argument('map', help='Файл карты')
+        subparser.add_argument('--x', type=float, required=True)
+        subparser.add_argument('--y', type=float, required=True)
+        subparser.add_argument('--grid', type=int, help='uid грида (по умолчанию - самый населённый грид)')
+        subparser.add_argument('--proto', action='append', help='Фильтр по прототипу, можно указать несколько раз')
+
+    near_parser = subparsers.add_parser('near', help='Сущности в радиусе от точки')
+    add_point_arguments(near_parser)
+    near_parser.add_argument('--radius', type=float, required=True, help='Радиус в тайлах')
+    near_parser.set_defaults(func=near)
+
+    nearest_parser = subparsers.add_parser('nearest', help='Ближайшие к точке сущности')
+    add_point_arguments(nearest_parser)
+    nearest_parser.add_argument('-k', type=int, default=1, help='Количество соседей')
+    nearest_parser.set_defaults(func=nearest)
+
+    outside_parser = subparsers.add_parser('outside-chunks', help='Сущности грида за пределами его чанков')
+    outside_parser.add_argument('map', help='Файл карты')
+    outside_parser.add_argument('--strict', action='store_true', help='Завершиться с ошибкой, если такие сущности есть')
+    outside_parser.set_defaults(func=outside_chunks)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+# Тесты отпечатков чанков карт (chunkprint.py).
+# Запуск: python -m unittest test_chunkprint (из Tools/_sunrise/mapping)
+
+import os
+import tempfile
+import unittest
+
+from chunkprint import build_manifest, get_dirty_chunks
+from mapfile import MapFile
+
+MAP = '''
+meta:
+  format: 6
+  postmapinit: false
+tilemap:
+  0: Space
+entities:
+- proto: ""
+  entities:
+  - uid: 1
+    components:
+    - type: Map
+  - uid: 2
+    components:
+    - type: Transform
+      parent: 1
+    - type: MapGrid
+      chunks:
+        0,0:
+          ind: 0,0
+          tiles: AAAA
+          version: 6
+        -1,-1:
+          ind: -1,-1
+          tiles: BBBB
+          version: 6
+        -1,-2:
+          ind: -1,-2
+          tiles: CCCC
+          version: 6
+    - type: DecalGrid
+      chunkCollection:
+        version: 2
+        nodes:
+        - node:
+            color: '#FFFFFFFF'
+            id: Arrows
+          decals:
+            562: -4,-1
+            563: 3,5
+    - type: Gravity
+      enabled: true
+- proto: WallSolid
+  entities:
+  - uid: 3
+    components:
+    - type: Transform
+      pos: 1.5,2.5
+      parent: 2
+  - uid: 4
+    components:
+    - type: Transform
+      pos: 40,-3
+      parent: 1
+  - uid: 5
+    components:
+    - type: Transform
+      parent: 2
+  - uid: 6
+    components:
+    - type: Transform
+      parent: 99
+'''
+
+
+class ChunkManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def build(self, data, name='test.yml'):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, 'w', encoding='utf8') as file:
+            file.write(data)
+        return build_manifest(MapFile(path, use_cache=False))
+
+    def test_entities_on_grid_and_map(self):
+        manifest = self.build(MAP)
+        self.assertEqual(set(manifest['chunks']), {'2/0,0', '2/-1,-1', '2/-1,-2', '1/2,-1'})
+
+    def test_unplaceable_entities_reported(self):
+        # 5 стоит на гриде без pos, у 6 нет такого родителя
+        manifest = self.build(MAP)
+        self.assertEqual(manifest['unanchored'], [5, 6])
+
+    def test_moved_decal_marks_both_chunks(self):
+        old_manifest = self.build(MAP)
+        new_manifest = self.build(MAP.replace('562: -4,-1', '562: -4,-20'))
+        self.assertEqual(get_dirty_chunks(old_manifest, new_manifest), ['2/-1,-1', '2/-1,-2'])
+
+    def test_changed_grid_component_marks_all_grid_chunks(self):
+        old_manifest = self.build(MAP)
+        new_manifest = self.build(MAP.replace('enabled: true', 'enabled: false'))
+        self.assertEqual(get_dirty_chunks(old_manifest, new_manifest), ['2/-1,-1', '2/-1,-2', '2/0,0'])
+
+    def test_unchanged_map_has_no_dirty_chunks(self):
+        self.assertEqual(get_dirty_chunks(self.build(MAP), self.build(MAP, 'copy.yml')), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
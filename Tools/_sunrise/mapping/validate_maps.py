@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+# Параллельная проверка файлов карт по схеме Yamale (RobustToolbox/Schemas/mapfile.yml).
+# Карты проверяются в пуле процессов, от самых больших к самым маленьким, чтобы долгие карты не оказались в хвосте очереди.
+# --changed-since <ref> ограничивает проверку картами, изменёнными относительно ref,
+# --timings <файл> записывает время проверки каждой карты, чтобы было видно, какие карты занимают время CI.
+# Каждая карта читается с диска и разбирается заново, без кеша MapFile и его загрузчика: проверяется сам файл,
+# а время в --timings - время холодного разбора, как в CI.
+
+import argparse
+import importlib.util
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+import typing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import yaml
+
+from mapfile import BASE_DIR_PATH, MAPS_DIR_PATH, get_map_files_paths
+
+# Актуальная схема лежит в движке, копия в Tools/Schemas используется, если сабмодуль не подтянут
+_ENGINE_SCHEMAS_DIR_PATH = os.path.join(BASE_DIR_PATH, 'RobustToolbox', 'Schemas')
+_SCHEMAS_DIR_PATH = _ENGINE_SCHEMAS_DIR_PATH if os.path.isfile(os.path.join(_ENGINE_SCHEMAS_DIR_PATH, 'mapfile.yml')) \
+    else os.path.join(BASE_DIR_PATH, 'Tools', 'Schemas')
+DEFAULT_SCHEMA_PATH = os.path.join(_SCHEMAS_DIR_PATH, 'mapfile.yml')
+DEFAULT_VALIDATORS_PATH = os.path.join(_SCHEMAS_DIR_PATH, 'mapfile_validators.py')
+MAP_PATH_PATTERN = re.compile(r'.*Resources/Maps/.*\.yml$')
+
+# Схема загружается один раз на процесс пула
+_schema = None
+
+
+# Обычный SafeLoader PyYAML, как в прежней проверке: теги `!type:Foo` (контейнеры, формы, звуки) сохраняют
+# только содержимое узла, схема карт их не проверяет
+class MapSchemaLoader(getattr(yaml, 'CSafeLoader', yaml.SafeLoader)):
+    pass
+
+
+def _construct_tagged(loader, tag_suffix, node):
+    if isinstance(node, yaml.MappingNode):
+        return loader.construct_mapping(node, deep=True)
+    if isinstance(node, yaml.SequenceNode):
+        return loader.construct_sequence(node, deep=True)
+    return loader.construct_scalar(node)
+
+
+MapSchemaLoader.add_multi_constructor('!', _construct_tagged)
+
+
+class MapValidationResult:
+    def __init__(self, path: str, size: int, seconds: float, errors: typing.List[str]):
+        self.path = path
+        self.size = size
+        self.seconds = seconds
+        self.errors = errors
+
+
+def load_validators(validators_path):
+    from yamale.validators import DefaultValidators, Validator
+
+    spec = importlib.util.spec_from_file_location('mapfile_validators', validators_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    validators = DefaultValidators.copy()
+    for value in vars(module).values():
+        if isinstance(value, type) and issubclass(value, Validator) and getattr(value, 'tag', None):
+            validators[value.tag] = value
+    return validators
+
+
+def init_worker(schema_path, validators_path):
+    import yamale
+
+    global _schema
+    _schema = yamale.make_schema(schema_path, validators=load_validators(validators_path))
+
+
+def validate_map(map_path) -> MapValidationResult:
+    import yamale
+
+    started = time.perf_counter()
+    errors = []
+    try:
+        # Карты содержат теги !type:, которые не понимает yamale.make_data
+        with open(map_path, 'r', encoding='utf8') as file:
+            data = yaml.load(file, Loader=MapSchemaLoader)
+        yamale.validate(_schema, [(data, map_path)])
+    except yamale.YamaleError as e:
+        for result in e.results:
+            errors.extend(result.errors)
+    except Exception as e:
+        errors.append(f'Не удалось проверить карту: {e}')
+
+    return MapValidationResult(map_path, os.path.getsize(map_path), time.perf_counter() - started, errors)
+
+
+def get_changed_maps(ref) -> typing.List[str]:
+    merge_base = subprocess.run(['git', 'merge-base', ref, 'HEAD'], cwd=BASE_DIR_PATH,
+                                check=True, capture_output=True, text=True).stdout.strip()
+    changed = subprocess.run(['git', 'diff', '--name-only', '--diff-filter=d', merge_base, '--', 'Resources/Maps'],
+                             cwd=BASE_DIR_PATH, check=True, capture_output=True, text=True).stdout.splitlines()
+
+    return [os.path.join(BASE_DIR_PATH, path) for path in changed if MAP_PATH_PATTERN.match(path)]
+
+
+def run(map_paths, schema_path, validators_path, jobs) -> typing.List[MapValidationResult]:
+    # Самые большие карты запускаются первыми: так общее время ближе к времени самой долгой карты
+    map_paths = sorted(map_paths, key=lambda path: (-os.path.getsize(path), path))
+
+    if jobs == 1:
+        init_worker(schema_path, validators_path)
+        return [validate_map(path) for path in map_paths]
+
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                             initargs=(schema_path, validators_path)) as executor:
+        futures = [executor.submit(validate_map, path) for path in map_paths]
+        for future in as_completed(futures):
+            results.append(future.result())
+
+    return sorted(results, key=lambda result: result.path)
+
+
+def write_timings(path, results: typing.List[MapValidationResult]):
+    timings = [{
+        'map': os.path.relpath(result.path, BASE_DIR_PATH),
+        'size': result.size,
+        'seconds': round(result.seconds, 3),
+        'errors': len(result.errors),
+    } for result in sorted(results, key=lambda result: -result.seconds)]
+
+    with open(path, 'w', encoding='utf8') as file:
+        json.dump(timings, file, indent=1, ensure_ascii=False)
+        file.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Параллельная проверка файлов карт по схеме')
+    parser.add_argument('maps', nargs='*', default=[MAPS_DIR_PATH], help='Файлы карт или каталоги (по умолчанию Resources/Maps)')
+    parser.add_argument('--schema', default=DEFAULT_SCHEMA_PATH, help='Схема Yamale')
+    parser.add_argument('--validators', default=DEFAULT_VALIDATORS_PATH, help='Модуль с дополнительными валидаторами Yamale')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, help='Количество процессов')
+    parser.add_argument('--changed-since', metavar='REF', help='Проверять только карты, изменённые относительно REF')
+    parser.add_argument('--timings', metavar='FILE', help='Записать время проверки каждой карты в JSON')
+    parser.add_argument('--slowest', type=int, default=10, help='Сколько самых долгих карт вывести в конце')
+
+    args = parser.parse_args()
+
+    map_paths = [path for path in get_map_files_paths(args.maps) if path.endswith('.yml')]
+    if args.changed_since:
+        changed = {os.path.realpath(path) for path in get_changed_maps(args.changed_since)}
+        map_paths = [path for path in map_paths if os.path.realpath(path) in changed]
+
+    if not map_paths:
+        print('Нет карт для проверки.')
+        return 0
+
+    started = time.perf_counter()
+    results = run(map_paths, args.schema, args.validators, max(1, args.jobs))
+    elapsed = time.perf_counter() - started
+
+    failed = [result for result in results if result.errors]
+    for result in failed:
+        for error in result.errors:
+            print(f'{os.path.relpath(result.path, BASE_DIR_PATH)}: {error}')
+
+    if args.timings:
+        write_timings(args.timings, results)
+
+    print(f'Проверено карт: {len(results)}, с ошибками: {len(failed)}, время: {elapsed:.1f} с')
+    for result in sorted(results, key=lambda result: -result.seconds)[:args.slowest]:
+        print(f'  {result.seconds:7.2f} с  {os.path.relpath(result.path, BASE_DIR_PATH)}')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
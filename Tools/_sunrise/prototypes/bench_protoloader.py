@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+# Бенчмарк загрузки всего дерева Resources/Prototypes разными загрузчиками YAML.
+# base - yaml.BaseLoader на чистом Python (так YAMLFile разбирал прототипы раньше), остальные - общий загрузчик protoloader.
+
+import argparse
+import pathlib
+import sys
+import time
+
+import yaml
+
+from protoindex import PROTOTYPES_DIR_PATH
+from protoloader import load, load_with_lines
+
+
+def load_base(data):
+    return yaml.load(data.decode('utf-8-sig'), Loader=yaml.BaseLoader)
+
+
+LOADERS = {
+    'base': load_base,
+    'protoloader': load,
+    'protoloader+lines': lambda data: load_with_lines(data)[0],
+}
+
+
+def read_files(prototypes_dir_path):
+    files = []
+    for path in sorted(pathlib.Path(prototypes_dir_path).rglob('*.yml')):
+        with open(path, 'rb') as file:
+            files.append(file.read())
+    return files
+
+
+def measure(loader, files, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for data in files:
+            loader(data)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк загрузчиков YAML на дереве прототипов')
+    parser.add_argument('--dir', default=PROTOTYPES_DIR_PATH, help='Каталог прототипов')
+    parser.add_argument('--repeat', type=int, default=1, help='Количество повторов (берётся лучшее время)')
+    parser.add_argument('--loaders', nargs='+', default=list(LOADERS), choices=list(LOADERS))
+
+    args = parser.parse_args()
+
+    files = read_files(args.dir)
+    total_size = sum(len(data) for data in files)
+    print(f'Файлов: {len(files)}, объём: {total_size / 1024 / 1024:.1f} МБ, libyaml: {yaml.__with_libyaml__}')
+
+    results = {}
+    for name in args.loaders:
+        results[name] = measure(LOADERS[name], files, args.repeat)
+
+    baseline = results.get('base')
+    for name, elapsed in results.items():
+        speedup = f'  x{baseline / elapsed:.1f}' if baseline else ''
+        print(f'{name:>20}: {elapsed:7.2f} с{speedup}')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+# Статистика компонентов и их полей по разрешённым (с учётом наследования) сущностям.
+# Для каждого компонента считается:
+#   - prototypes: на скольких неабстрактных сущностях он есть;
+#   - spawned: сколько экземпляров стоит на картах (сущности карт, взвешенные по количеству каждого proto);
+#   - fields: для каждого поля - на скольких прототипах оно задано и сколько у него различных значений.
+# Поля с одним значением на всех прототипах - кандидаты на значения по умолчанию в C#, а компоненты с наибольшим
+# spawned - первые кандидаты на экономию памяти.
+
+import argparse
+import json
+import logging
+import os
+import sys
+import typing
+from collections import Counter
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mapping'))
+
+from mapfile import MapFile, MAPS_DIR_PATH, get_map_files_paths
+from protoindex import PrototypeIndex
+from protoinherit import InheritanceResolver
+from protoloader import to_plain
+
+
+class FieldStats:
+    def __init__(self):
+        self.prototypes = 0
+        self.values: typing.Set[str] = set()
+
+
+class ComponentStats:
+    def __init__(self, name):
+        self.name = name
+        self.prototypes = 0
+        self.spawned = 0
+        self.fields: typing.Dict[str, FieldStats] = {}
+
+    def to_dict(self):
+        return {
+            'component': self.name,
+            'prototypes': self.prototypes,
+            'spawned': self.spawned,
+            'fields': {name: {'prototypes': field.prototypes, 'distinct_values': len(field.values)}
+                       for name, field in sorted(self.fields.items())},
+        }
+
+
+# Значение поля приводится к строке JSON, чтобы словари и списки можно было сравнивать через множество
+def get_value_key(value) -> str:
+    return json.dumps(to_plain(value), sort_keys=True, ensure_ascii=False, default=str)
+
+
+def get_map_proto_counts(map_paths) -> Counter:
+    counts = Counter()
+    for map_path in map_paths:
+        counts.update(entity.proto for entity in MapFile(map_path).get_entities() if entity.proto)
+    return counts
+
+
+def collect_component_stats(resolver: InheritanceResolver, proto_counts: Counter) -> typing.Dict[str, ComponentStats]:
+    stats: typing.Dict[str, ComponentStats] = {}
+    resolver.resolve_all()
+
+    for id, record in resolver.records.items():
+        if record.abstract:
+            continue
+
+        spawned = proto_counts.get(id, 0)
+        for component in (resolver.resolved.get(id) or {}).get('components') or []:
+            name = component.get('type')
+            if not isinstance(name, str):
+                continue
+
+            component_stats = stats.get(name)
+            if component_stats is None:
+                component_stats = stats[name] = ComponentStats(name)
+            component_stats.prototypes += 1
+            component_stats.spawned += spawned
+
+            for field, value in component.items():
+                if field == 'type':
+                    continue
+                field_stats = component_stats.fields.get(field)
+                if field_stats is None:
+                    field_stats = component_stats.fields[field] = FieldStats()
+                field_stats.prototypes += 1
+                field_stats.values.add(get_value_key(value))
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Статистика компонентов и их полей по разрешённым сущностям')
+    parser.add_argument('maps', nargs='*', default=[MAPS_DIR_PATH], help='Карты или каталоги карт для подсчёта экземпляров')
+    parser.add_argument('--sort', choices=['spawned', 'prototypes'], default='spawned', help='Порядок вывода')
+    parser.add_argument('--top', type=int, default=30, help='Сколько компонентов вывести')
+    parser.add_argument('--fields', action='store_true', help='Выводить статистику полей')
+    parser.add_argument('--json', metavar='FILE', help='Записать полный отчёт в JSON')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    index = PrototypeIndex()
+    index.update()
+    resolver = InheritanceResolver(index, 'entity')
+    index.close()
+
+    map_paths = get_map_files_paths(args.maps)
+    proto_counts = get_map_proto_counts(map_paths)
+    logging.info(f'Карт: {len(map_paths)}, сущностей на картах: {sum(proto_counts.values())}')
+
+    stats = collect_component_stats(resolver, proto_counts)
+    ordered = sorted(stats.values(), key=lambda s: (getattr(s, args.sort), s.name), reverse=True)
+    total_spawned = sum(proto_counts.values()) or 1
+
+    print(f'{"Компонент":<40} {"Прототипов":>10} {"На картах":>10} {"Доля":>7}')
+    for component_stats in ordered[:args.top]:
+        print(f'{component_stats.name:<40} {component_stats.prototypes:>10} {component_stats.spawned:>10} '
+              f'{component_stats.spawned / total_spawned:>7.1%}')
+        if args.fields:
+            for name, field in sorted(component_stats.fields.items(), key=lambda item: -item[1].prototypes):
+                print(f'    {name:<36} {field.prototypes:>10} различных значений: {len(field.values)}')
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf8') as file:
+            json.dump([component_stats.to_dict() for component_stats in ordered], file, ensure_ascii=False, indent=1)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+# Поиск дублирующихся id прототипов одного вида (в том числе между upstream и _Sunrise).
+# Файлы читаются в пуле процессов потоком событий libyaml без построения объектов: из каждого элемента корневого
+# списка берутся только type и id, вложенные узлы пропускаются. Проверка всего дерева занимает пару секунд,
+# поэтому её можно подключить как pre-commit хук:
+#   python3 Tools/_sunrise/prototypes/duplicateids.py || exit 1
+
+import argparse
+import os
+import pathlib
+import sys
+import typing
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+from protoindex import PROTOTYPES_DIR_PATH, BASE_DIR_PATH
+
+_Parser = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+class PrototypeLocation(typing.NamedTuple):
+    file: str
+    line: int
+
+
+def scan_file(full_path) -> typing.List[typing.Tuple[str, str, int]]:
+    with open(full_path, 'rb') as file:
+        data = file.read().decode('utf-8-sig')
+
+    result = []
+    depth = 0
+    # Состояние текущего элемента корневого списка
+    item_line = 0
+    item_fields = {}
+    pending_key = None
+    expect_key = True
+    # Значения якорей: id часто задаётся через `id: *anchor`
+    anchors = {}
+
+    for event in yaml.parse(data, Loader=_Parser):
+        if isinstance(event, yaml.ScalarEvent) and event.anchor:
+            anchors[event.anchor] = event.value
+
+        if isinstance(event, (yaml.SequenceStartEvent, yaml.MappingStartEvent)):
+            if depth == 2 and not expect_key:
+                # Вложенное значение поля элемента
+                pending_key = None
+                expect_key = True
+            depth += 1
+            if depth == 1 and not isinstance(event, yaml.SequenceStartEvent):
+                # Прототипы объявляются только в корневом списке
+                break
+            if depth == 2 and isinstance(event, yaml.MappingStartEvent):
+                item_line = event.start_mark.line + 1
+                item_fields = {}
+                expect_key = True
+            continue
+
+        if isinstance(event, (yaml.SequenceEndEvent, yaml.MappingEndEvent)):
+            depth -= 1
+            if depth == 1 and isinstance(event, yaml.MappingEndEvent):
+                if 'type' in item_fields and 'id' in item_fields:
+                    result.append((item_fields['type'], item_fields['id'], item_line))
+            continue
+
+        if depth != 2:
+            continue
+
+        if isinstance(event, yaml.ScalarEvent):
+            if expect_key:
+                pending_key = event.value
+                expect_key = False
+            else:
+                if pending_key in ('type', 'id'):
+                    item_fields[pending_key] = event.value
+                pending_key = None
+                expect_key = True
+        elif isinstance(event, yaml.AliasEvent) and not expect_key:
+            if pending_key in ('type', 'id') and event.anchor in anchors:
+                item_fields[pending_key] = anchors[event.anchor]
+            pending_key = None
+            expect_key = True
+
+    return result
+
+
+def _scan_file_safe(full_path):
+    try:
+        return full_path, scan_file(full_path), None
+    except yaml.YAMLError as e:
+        return full_path, [], str(e)
+
+
+def find_duplicates(files_paths, jobs=None) -> typing.Tuple[typing.Dict[typing.Tuple[str, str], typing.List[PrototypeLocation]], typing.List[str]]:
+    locations: typing.Dict[typing.Tuple[str, str], typing.List[PrototypeLocation]] = {}
+    errors = []
+
+    if jobs == 1:
+        results = map(_scan_file_safe, files_paths)
+    else:
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        results = executor.map(_scan_file_safe, files_paths, chunksize=32)
+
+    try:
+        for full_path, prototypes, error in results:
+            relative_path = os.path.relpath(full_path, BASE_DIR_PATH)
+            if error:
+                errors.append(f'{relative_path}: {error}')
+                continue
+            for kind, id, line in prototypes:
+                locations.setdefault((kind, id), []).append(PrototypeLocation(relative_path, line))
+    finally:
+        if jobs != 1:
+            executor.shutdown()
+
+    duplicates = {key: value for key, value in locations.items() if len(value) > 1}
+    return duplicates, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Поиск дублирующихся id прототипов')
+    parser.add_argument('dirs', nargs='*', default=[PROTOTYPES_DIR_PATH], help='Каталоги прототипов')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='Количество процессов (по умолчанию - все ядра)')
+
+    args = parser.parse_args()
+
+    files_paths = []
+    for dir_path in args.dirs:
+        files_paths.extend(str(path) for path in sorted(pathlib.Path(dir_path).rglob('*.yml')))
+
+    duplicates, errors = find_duplicates(files_paths, args.jobs)
+
+    for error in errors:
+        print(f'Ошибка разбора {error}')
+
+    for (kind, id), locations in sorted(duplicates.items()):
+        print(f'Дубликат {kind} "{id}":')
+        for location in locations:
+            print(f'  {location.file}:{location.line}')
+
+    if duplicates or errors:
+        print(f'Найдено дубликатов: {len(duplicates)}, ошибок разбора: {len(errors)}')
+        return 1
+
+    print(f'Дубликатов не найдено ({len(files_paths)} файлов).')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+
+# Граф зависимостей прототипов и поиск "мёртвых" сущностей.
+# Рёбра ведут от источника (прототип, карта или файл .cs) к id сущности, на которую он ссылается: parent,
+# productEntity, startingGear, записи entityTable, содержимое хранилищ, прототипы сущностей на картах и строки в C#.
+# Данные берутся из индекса прототипов и кеша разобранных карт, граф сохраняется в базу индекса и
+# перестраивается, только если изменились прототипы, карты или код, поэтому запрос "кто использует X" мгновенный.
+#
+# Корнями считаются карты, код и все прототипы, кроме сущностей. Неабстрактная сущность, недостижимая из корней,
+# ничем не порождается.
+
+import argparse
+import hashlib
+import itertools
+import logging
+import os
+import pathlib
+import re
+import sys
+import typing
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mapping'))
+
+from mapfile import MapFile, MAPS_DIR_PATH, get_map_files_paths
+from protoindex import PrototypeIndex, BASE_DIR_PATH, DEFAULT_DB_PATH
+
+# Поля, строки в которых не являются ссылками на сущности, даже если совпадают с чьим-то id.
+# Вложенные `id` (содержимое хранилищ, PDA, entityTable) - ссылки, поэтому пропускается только id самого прототипа
+NON_REFERENCE_FIELDS = {'type', 'name', 'description', 'suffix', 'state', 'sprite', 'rsi', 'map', 'tags',
+                        'abstract', 'categories'}
+# Словари, ключами которых служат id сущностей (значения - количество, вес, замена). Ключи остальных словарей -
+# имена полей, слотов, типов урона и т.п., и совпадение с id сущности там случайно
+ID_KEYED_FIELDS = {'startingInventory', 'contrabandInventory', 'emaggedInventory', 'solids', 'spawn', 'spawns', 'weights',
+                   'meteors', 'spellActions', 'entityMask', 'rules'}
+CODE_STRING_PATTERN = re.compile(r'"([A-Za-z][A-Za-z0-9_]*)"')
+CODE_EXTENSIONS = ('.cs',)
+
+SOURCE_PROTOTYPE = 'prototype'
+SOURCE_MAP = 'map'
+SOURCE_CODE = 'code'
+
+# Меняется при изменении правил сбора ссылок, чтобы сохранённый граф перестроился
+GRAPH_VERSION = 2
+
+
+def collect_strings(value, strings, skip_fields=NON_REFERENCE_FIELDS, id_keyed=False):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if id_keyed and isinstance(key, str):
+                strings.add(key)
+            if key in skip_fields:
+                continue
+            collect_strings(item, strings, skip_fields, key in ID_KEYED_FIELDS)
+    elif isinstance(value, list):
+        for item in value:
+            collect_strings(item, strings, skip_fields)
+    elif isinstance(value, str):
+        strings.add(value)
+    return strings
+
+
+def get_prototype_references(record, entity_ids) -> typing.Set[str]:
+    references = set(parent for parent in record.parents if parent in entity_ids) if record.kind == 'entity' else set()
+    strings = set()
+    for key, value in (record.data or {}).items():
+        if key in NON_REFERENCE_FIELDS or key in ('id', 'parent'):
+            continue
+        collect_strings(value, strings, id_keyed=key in ID_KEYED_FIELDS)
+    references.update(strings & entity_ids)
+    references.discard(record.id if record.kind == 'entity' else None)
+    return references
+
+
+def get_code_files(base_dir_path=BASE_DIR_PATH) -> typing.List[str]:
+    files_paths = []
+    for project_dir in sorted(pathlib.Path(base_dir_path).glob('Content.*')):
+        for root, _, filenames in os.walk(project_dir):
+            files_paths.extend(os.path.join(root, filename) for filename in filenames if filename.endswith(CODE_EXTENSIONS))
+    return sorted(files_paths)
+
+
+def get_sources_state(index: PrototypeIndex, map_paths, code_paths) -> str:
+    # Состояние источников: хеши файлов прототипов, уже посчитанные индексом, и размер/время изменения карт и кода.
+    # Содержимое карт и кода при проверке не читается
+    digest = hashlib.sha1(f'{GRAPH_VERSION}\n'.encode('utf8'))
+    for path, file_hash in index.conn.execute('SELECT path, hash FROM files ORDER BY path'):
+        digest.update(f'{path}:{file_hash}\n'.encode('utf8'))
+    for path in itertools.chain(map_paths, code_paths):
+        stat = os.stat(path)
+        digest.update(f'{path}:{stat.st_size}:{stat.st_mtime_ns}\n'.encode('utf8'))
+    return digest.hexdigest()
+
+
+class PrototypeGraph:
+    def __init__(self, index: PrototypeIndex):
+        self.index = index
+        self.conn = index.conn
+        self.create_tables()
+
+    def create_tables(self):
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS graph_edges (
+                source_kind TEXT NOT NULL,
+                source TEXT NOT NULL,
+                target TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS graph_edges_source ON graph_edges (source_kind, source);
+            CREATE INDEX IF NOT EXISTS graph_edges_target ON graph_edges (target);
+            CREATE TABLE IF NOT EXISTS graph_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        ''')
+        self.conn.commit()
+
+    def get_state(self):
+        row = self.conn.execute("SELECT value FROM graph_meta WHERE key = 'state'").fetchone()
+        return row[0] if row else None
+
+    # Перестраивает граф, если изменились прототипы, карты или код. Возвращает True, если граф был перестроен
+    def update(self, maps_dir_path=MAPS_DIR_PATH, scan_code=True) -> bool:
+        map_paths = get_map_files_paths([maps_dir_path])
+        code_paths = get_code_files() if scan_code else []
+        state = get_sources_state(self.index, map_paths, code_paths)
+        if state == self.get_state():
+            return False
+
+        entity_ids = {record.id for record in self.index.get_all('entity', with_data=False)}
+        edges = []
+
+        for record in self.index.get_all():
+            source_kind = SOURCE_PROTOTYPE
+            source = f'{record.kind}:{record.id}'
+            edges.extend((source_kind, source, target) for target in get_prototype_references(record, entity_ids))
+
+        for map_path in map_paths:
+            source = os.path.relpath(map_path, BASE_DIR_PATH)
+            protos = {entity.proto for entity in MapFile(map_path).get_entities() if entity.proto}
+            edges.extend((SOURCE_MAP, source, target) for target in protos)
+
+        for code_path in code_paths:
+            with open(code_path, 'r', encoding='utf-8-sig', errors='ignore') as file:
+                strings = set(CODE_STRING_PATTERN.findall(file.read()))
+            source = os.path.relpath(code_path, BASE_DIR_PATH)
+            edges.extend((SOURCE_CODE, source, target) for target in strings & entity_ids)
+
+        with self.conn:
+            self.conn.execute('DELETE FROM graph_edges')
+            self.conn.executemany('INSERT INTO graph_edges VALUES (?, ?, ?)', edges)
+            self.conn.execute("INSERT OR REPLACE INTO graph_meta VALUES ('state', ?)", (state,))
+
+        return True
+
+    def get_dependencies(self, entity_id) -> typing.List[str]:
+        rows = self.conn.execute('SELECT target FROM graph_edges WHERE source_kind = ? AND source = ? ORDER BY target',
+                                 (SOURCE_PROTOTYPE, f'entity:{entity_id}'))
+        return [row[0] for row in rows]
+
+    def get_users(self, entity_id) -> typing.List[typing.Tuple[str, str]]:
+        rows = self.conn.execute('SELECT source_kind, source FROM graph_edges WHERE target = ? ORDER BY source_kind, source',
+                                 (entity_id,))
+        return list(rows)
+
+    # Транзитивное замыкание: всё, от чего сущность зависит прямо или через другие сущности
+    def get_closure(self, entity_id) -> typing.List[str]:
+        adjacency = self.get_entity_adjacency()
+        visited = set()
+        stack = [entity_id]
+        while stack:
+            current = stack.pop()
+            for target in adjacency.get(current, ()):
+                if target not in visited:
+                    visited.add(target)
+                    stack.append(target)
+        visited.discard(entity_id)
+        return sorted(visited)
+
+    def get_entity_adjacency(self) -> typing.Dict[str, typing.List[str]]:
+        adjacency = {}
+        rows = self.conn.execute('SELECT source, target FROM graph_edges WHERE source_kind = ? AND source LIKE ?',
+                                 (SOURCE_PROTOTYPE, 'entity:%'))
+        for source, target in rows:
+            adjacency.setdefault(source[len('entity:'):], []).append(target)
+        return adjacency
+
+    def get_unreachable_entities(self) -> typing.List[str]:
+        adjacency = self.get_entity_adjacency()
+        reachable = set()
+        stack = [row[0] for row in self.conn.execute('SELECT DISTINCT target FROM graph_edges WHERE NOT (source_kind = ? AND source LIKE ?)',
+                                                     (SOURCE_PROTOTYPE, 'entity:%'))]
+        while stack:
+            current = stack.pop()
+            if current in reachable:
+                continue
+            reachable.add(current)
+            stack.extend(adjacency.get(current, ()))
+
+        entities = self.index.get_all('entity', with_data=False)
+        return sorted({record.id for record in entities if not record.abstract and record.id not in reachable})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Граф зависимостей прототипов и поиск неиспользуемых сущностей')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='Путь к базе индекса')
+    parser.add_argument('--no-code', action='store_true', help='Не учитывать ссылки из файлов .cs')
+    parser.add_argument('--dead', action='store_true', help='Вывести неабстрактные сущности, которые ничем не порождаются')
+    parser.add_argument('--users', metavar='ID', help='Кто ссылается на сущность')
+    parser.add_argument('--closure', metavar='ID', help='Транзитивное замыкание зависимостей сущности')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    index = PrototypeIndex(args.db)
+    index.update()
+    graph = PrototypeGraph(index)
+    if graph.update(scan_code=not args.no_code):
+        logging.info('Граф зависимостей перестроен')
+
+    if args.users:
+        for source_kind, source in graph.get_users(args.users):
+            print(f'{source_kind}\t{source}')
+
+    if args.closure:
+        for entity_id in graph.get_closure(args.closure):
+            print(entity_id)
+
+    if args.dead:
+        dead = graph.get_unreachable_entities()
+        for entity_id in dead:
+            record = index.get('entity', entity_id)
+            print(f'Resources/Prototypes/{record.file}:{record.line}: {entity_id}')
+        logging.info(f'Неиспользуемых сущностей: {len(dead)}')
+
+    index.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
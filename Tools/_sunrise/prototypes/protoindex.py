@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+
+# Индекс прототипов Resources/Prototypes в SQLite.
+# Файлы разбираются в пуле процессов C-загрузчиком libyaml, в базу пишутся (kind, id, parents, abstract, file, line,
+# name, description, suffix) и сырые данные прототипа. Повторный запуск переразбирает только файлы с изменившимся хешем.
+#
+# Использование из других скриптов Tools:
+#   sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'prototypes'))
+#   from protoindex import PrototypeIndex
+#   index = PrototypeIndex()
+#   index.update()
+#   entity = index.get('entity', 'Wirecutter')
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import sqlite3
+import sys
+import typing
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+from protoloader import PrototypeLoader, scalar_to_str, to_plain, from_plain_hook
+
+BASE_DIR_PATH = pathlib.Path(__file__).resolve().parents[3]
+PROTOTYPES_DIR_PATH = os.path.join(BASE_DIR_PATH, 'Resources', 'Prototypes')
+CACHE_DIR_PATH = os.path.join(BASE_DIR_PATH, 'Tools', '_sunrise', '.cache')
+DEFAULT_DB_PATH = os.path.join(CACHE_DIR_PATH, 'prototypes.db')
+
+# При изменении структуры базы или формата данных индекс перестраивается целиком
+SCHEMA_VERSION = 2
+
+
+class PrototypeRecord:
+    def __init__(self, kind, id, parents, abstract, file, line, name, description, suffix, data):
+        self.kind = kind
+        self.id = id
+        self.parents = parents
+        self.abstract = abstract
+        self.file = file
+        self.line = line
+        self.name = name
+        self.description = description
+        self.suffix = suffix
+        self.data = data
+
+    @classmethod
+    def from_row(cls, row):
+        kind, id, parents, abstract, file, line, name, description, suffix, data = row
+        return cls(kind, id, json.loads(parents), bool(abstract), file, line, name, description, suffix,
+                   json.loads(data, object_hook=from_plain_hook) if data is not None else None)
+
+    def get_full_path(self, prototypes_dir_path=PROTOTYPES_DIR_PATH):
+        return os.path.join(prototypes_dir_path, self.file)
+
+
+def get_file_hash(file_path):
+    with open(file_path, 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def parse_prototype_file(prototypes_dir_path, relative_path):
+    full_path = os.path.join(prototypes_dir_path, relative_path)
+    with open(full_path, 'rb') as file:
+        raw_data = file.read()
+    file_hash = hashlib.sha1(raw_data).hexdigest()
+
+    rows = []
+    loader = PrototypeLoader(raw_data.decode('utf-8-sig'))
+    try:
+        root = loader.get_single_node()
+        if not isinstance(root, yaml.SequenceNode):
+            return relative_path, file_hash, rows
+
+        for item_node in root.value:
+            if not isinstance(item_node, yaml.MappingNode):
+                continue
+
+            item = loader.construct_object(item_node, deep=True)
+            if 'type' not in item or 'id' not in item:
+                continue
+
+            parents = item.get('parent')
+            if parents is None:
+                parents = []
+            elif not isinstance(parents, list):
+                parents = [parents]
+
+            rows.append((
+                str(item['type']),
+                str(item['id']),
+                json.dumps([str(parent) for parent in parents]),
+                1 if item.get('abstract') is True else 0,
+                relative_path,
+                item_node.start_mark.line + 1,
+                scalar_to_str(item.get('name')),
+                scalar_to_str(item.get('description')),
+                scalar_to_str(item.get('suffix')),
+                json.dumps(to_plain(item), ensure_ascii=False, default=str),
+            ))
+    finally:
+        loader.dispose()
+
+    return relative_path, file_hash, rows
+
+
+def _parse_prototype_file_safe(args):
+    prototypes_dir_path, relative_path = args
+    try:
+        return parse_prototype_file(prototypes_dir_path, relative_path), None
+    except Exception as e:
+        return None, (relative_path, str(e))
+
+
+class PrototypeIndex:
+    def __init__(self, db_path=DEFAULT_DB_PATH, prototypes_dir_path=PROTOTYPES_DIR_PATH):
+        self.db_path = db_path
+        self.prototypes_dir_path = prototypes_dir_path
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.create_tables()
+
+    def create_tables(self):
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self.conn.executescript('''
+                DROP TABLE IF EXISTS files;
+                DROP TABLE IF EXISTS prototypes;
+            ''')
+
+        self.conn.executescript(f'''
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                hash TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS prototypes (
+                kind TEXT NOT NULL,
+                id TEXT NOT NULL,
+                parents TEXT NOT NULL,
+                abstract INTEGER NOT NULL,
+                file TEXT NOT NULL,
+                line INTEGER NOT NULL,
+                name TEXT,
+                description TEXT,
+                suffix TEXT,
+                data TEXT
+            );
+            CREATE INDEX IF NOT EXISTS prototypes_kind_id ON prototypes (kind, id);
+            CREATE INDEX IF NOT EXISTS prototypes_file ON prototypes (file);
+            PRAGMA user_version = {SCHEMA_VERSION};
+        ''')
+        self.conn.commit()
+
+    def get_prototype_files(self) -> typing.List[str]:
+        paths = []
+        for path in pathlib.Path(self.prototypes_dir_path).rglob('*.yml'):
+            paths.append(path.relative_to(self.prototypes_dir_path).as_posix())
+        return sorted(paths)
+
+    # Переразбирает новые и изменённые файлы, удаляет из индекса пропавшие. Возвращает (изменённые, удалённые)
+    def update(self, jobs=None) -> typing.Tuple[typing.List[str], typing.List[str]]:
+        indexed = dict(self.conn.execute('SELECT path, hash FROM files'))
+        current = self.get_prototype_files()
+
+        changed = []
+        for relative_path in current:
+            if indexed.get(relative_path) != get_file_hash(os.path.join(self.prototypes_dir_path, relative_path)):
+                changed.append(relative_path)
+        removed = sorted(set(indexed) - set(current))
+
+        results = []
+        if changed:
+            tasks = [(self.prototypes_dir_path, relative_path) for relative_path in changed]
+            if jobs == 1 or len(changed) == 1:
+                results = list(map(_parse_prototype_file_safe, tasks))
+            else:
+                with ProcessPoolExecutor(max_workers=jobs) as executor:
+                    results = list(executor.map(_parse_prototype_file_safe, tasks, chunksize=16))
+
+        with self.conn:
+            for relative_path in removed + changed:
+                self.conn.execute('DELETE FROM prototypes WHERE file = ?', (relative_path,))
+                self.conn.execute('DELETE FROM files WHERE path = ?', (relative_path,))
+
+            for result, error in results:
+                if error:
+                    logging.warning(f'Не удалось разобрать {error[0]}: {error[1]}')
+                    continue
+
+                relative_path, file_hash, rows = result
+                self.conn.executemany('INSERT INTO prototypes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+                self.conn.execute('INSERT INTO files VALUES (?, ?)', (relative_path, file_hash))
+
+        return changed, removed
+
+    def get(self, kind, id) -> typing.Optional[PrototypeRecord]:
+        row = self.conn.execute('SELECT * FROM prototypes WHERE kind = ? AND id = ? LIMIT 1', (kind, id)).fetchone()
+        return PrototypeRecord.from_row(row) if row else None
+
+    def get_all(self, kind=None, with_data=True) -> typing.List[PrototypeRecord]:
+        columns = '*' if with_data else 'kind, id, parents, abstract, file, line, name, description, suffix, NULL'
+        if kind:
+            rows = self.conn.execute(f'SELECT {columns} FROM prototypes WHERE kind = ? ORDER BY file, line', (kind,))
+        else:
+            rows = self.conn.execute(f'SELECT {columns} FROM prototypes ORDER BY file, line')
+        return [PrototypeRecord.from_row(row) for row in rows]
+
+    def get_by_file(self, relative_path) -> typing.List[PrototypeRecord]:
+        rows = self.conn.execute('SELECT * FROM prototypes WHERE file = ? ORDER BY line', (relative_path,))
+        return [PrototypeRecord.from_row(row) for row in rows]
+
+    def get_kinds(self) -> typing.Dict[str, int]:
+        return dict(self.conn.execute('SELECT kind, COUNT(*) FROM prototypes GROUP BY kind ORDER BY COUNT(*) DESC'))
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Индекс прототипов Resources/Prototypes в SQLite')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='Путь к базе индекса')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='Количество процессов (по умолчанию - все ядра)')
+    parser.add_argument('--rebuild', action='store_true', help='Перестроить индекс с нуля')
+    parser.add_argument('--get', nargs=2, metavar=('KIND', 'ID'), help='Вывести прототип из индекса')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.rebuild and os.path.isfile(args.db):
+        os.remove(args.db)
+
+    index = PrototypeIndex(args.db)
+    changed, removed = index.update(args.jobs)
+    logging.info(f'Переиндексировано файлов: {len(changed)}, удалено: {len(removed)}')
+
+    if args.get:
+        record = index.get(*args.get)
+        if not record:
+            logging.error(f'Прототип {args.get[0]} {args.get[1]} не найден')
+            return 1
+        print(json.dumps(vars(record), ensure_ascii=False, indent=2))
+    else:
+        kinds = index.get_kinds()
+        logging.info(f'Прототипов в индексе: {sum(kinds.values())}, видов: {len(kinds)}')
+
+    index.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+# Разрешение наследования прототипов (parent / список parent) поверх индекса protoindex.
+# Граф родителей упорядочивается топологически, поэтому каждый прототип (и каждая абстрактная база) разрешается
+# ровно один раз, после всех своих родителей. Циклы и отсутствующие родители собираются в отчёт.
+#
+# Правила слияния повторяют движок: поля потомка важнее полей родителя, при нескольких родителях приоритет у
+# первого в списке; компоненты сливаются по type, поля компонента потомка перекрывают поля того же компонента родителя.
+
+import argparse
+import json
+import logging
+import sys
+import time
+import typing
+
+from protoindex import PrototypeIndex, PrototypeRecord
+from protoloader import to_plain
+
+# Поля, которые не наследуются ([NeverPushInheritance] / служебные поля прототипа)
+NEVER_INHERITED_FIELDS = {'type', 'id', 'parent', 'abstract'}
+
+
+def merge_components(child_components, parent_components):
+    if not parent_components:
+        return child_components
+    if not child_components:
+        return parent_components
+
+    child_by_type = {component.get('type'): component for component in child_components}
+    merged = []
+    for parent_component in parent_components:
+        component_type = parent_component.get('type')
+        child_component = child_by_type.pop(component_type, None)
+        if child_component is None:
+            merged.append(parent_component)
+        else:
+            merged.append({**parent_component, **child_component})
+
+    merged.extend(component for component in child_components if component.get('type') in child_by_type)
+    return merged
+
+
+def merge_prototype(child: dict, parents: typing.List[dict]) -> dict:
+    result = dict(child)
+    for parent in parents:
+        for key, value in parent.items():
+            if key in NEVER_INHERITED_FIELDS:
+                continue
+            if key == 'components':
+                result['components'] = merge_components(result.get('components'), value)
+            elif key not in result:
+                result[key] = value
+    return result
+
+
+class InheritanceResolver:
+    def __init__(self, index: PrototypeIndex, kind='entity'):
+        self.kind = kind
+        self.records: typing.Dict[str, PrototypeRecord] = {}
+        for record in index.get_all(kind):
+            # Дубликаты id ищет отдельная проверка, здесь используется первое объявление
+            self.records.setdefault(record.id, record)
+
+        self.missing_parents: typing.List[typing.Tuple[str, str]] = []
+        self.cycles: typing.List[typing.List[str]] = []
+        self.order = self.get_topological_order()
+        self.resolved: typing.Dict[str, dict] = {}
+        self.resolving: typing.Set[str] = set()
+
+    def get_parents(self, id) -> typing.List[str]:
+        record = self.records.get(id)
+        return [parent for parent in record.parents if parent in self.records] if record else []
+
+    # Алгоритм Кана: прототипы без неразрешённых родителей идут первыми. Оставшиеся узлы лежат в циклах или за ними
+    def get_topological_order(self) -> typing.List[str]:
+        children: typing.Dict[str, typing.List[str]] = {}
+        pending_parents: typing.Dict[str, int] = {}
+
+        for id, record in self.records.items():
+            count = 0
+            for parent in record.parents:
+                if parent not in self.records:
+                    self.missing_parents.append((id, parent))
+                    continue
+                children.setdefault(parent, []).append(id)
+                count += 1
+            pending_parents[id] = count
+
+        queue = [id for id, count in pending_parents.items() if count == 0]
+        order = []
+        while queue:
+            id = queue.pop()
+            order.append(id)
+            for child in children.get(id, ()):
+                pending_parents[child] -= 1
+                if pending_parents[child] == 0:
+                    queue.append(child)
+
+        remaining = {id for id, count in pending_parents.items() if count > 0}
+        if remaining:
+            self.cycles = self.find_cycles(remaining)
+            order.extend(sorted(remaining))
+
+        return order
+
+    def find_cycles(self, nodes: typing.Set[str]) -> typing.List[typing.List[str]]:
+        cycles = []
+        visited = set()
+        for start in sorted(nodes):
+            if start in visited:
+                continue
+
+            path = []
+            position = {}
+            current = start
+            while current is not None and current not in visited:
+                visited.add(current)
+                position[current] = len(path)
+                path.append(current)
+                current = next((parent for parent in self.get_parents(current) if parent in nodes), None)
+
+            if current is not None and current in position:
+                cycles.append(path[position[current]:])
+
+        return cycles
+
+    def resolve_all(self) -> typing.Dict[str, dict]:
+        for id in self.order:
+            self.resolve(id)
+        return self.resolved
+
+    def resolve(self, id) -> typing.Optional[dict]:
+        if id in self.resolved:
+            return self.resolved[id]
+
+        record = self.records.get(id)
+        if record is None:
+            return None
+
+        # Родитель, который сейчас разрешается выше по стеку, замыкает цикл и пропускается
+        self.resolving.add(id)
+        parents = []
+        for parent in self.get_parents(id):
+            if parent in self.resolved:
+                parents.append(self.resolved[parent])
+            elif parent not in self.resolving:
+                parents.append(self.resolve(parent))
+        self.resolving.discard(id)
+
+        resolved = merge_prototype(record.data, parents)
+        self.resolved[id] = resolved
+        return resolved
+
+    def get_ancestors(self, id) -> typing.List[str]:
+        ancestors = []
+        stack = list(reversed(self.get_parents(id)))
+        while stack:
+            parent = stack.pop()
+            if parent in ancestors:
+                continue
+            ancestors.append(parent)
+            stack.extend(reversed(self.get_parents(parent)))
+        return ancestors
+
+    def get_components(self, id) -> typing.Dict[str, dict]:
+        resolved = self.resolve(id) or {}
+        return {component.get('type'): component for component in resolved.get('components') or []}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Разрешение наследования прототипов')
+    parser.add_argument('--kind', default='entity', help='Вид прототипов (по умолчанию entity)')
+    parser.add_argument('--show', metavar='ID', help='Вывести разрешённый прототип')
+    parser.add_argument('--check', action='store_true', help='Завершиться с ошибкой при циклах или отсутствующих родителях')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    index = PrototypeIndex()
+    index.update()
+
+    started = time.perf_counter()
+    resolver = InheritanceResolver(index, args.kind)
+    resolved = resolver.resolve_all()
+    logging.info(f'Разрешено прототипов {args.kind}: {len(resolved)} за {time.perf_counter() - started:.2f} с')
+
+    for id, parent in resolver.missing_parents:
+        logging.warning(f'{resolver.records[id].file}:{resolver.records[id].line}: {id} наследуется от несуществующего {parent}')
+    for cycle in resolver.cycles:
+        logging.warning(f'Цикл наследования: {" -> ".join(cycle + [cycle[0]])}')
+
+    if args.show:
+        prototype = resolver.resolve(args.show)
+        if prototype is None:
+            logging.error(f'Прототип {args.show} не найден')
+            return 1
+        print(json.dumps(to_plain(prototype), ensure_ascii=False, indent=2))
+
+    index.close()
+
+    if args.check and (resolver.missing_parents or resolver.cycles):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
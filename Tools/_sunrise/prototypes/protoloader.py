@@ -0,0 +1,178 @@
+# Общий загрузчик YAML прототипов и карт.
+# Построен на C-загрузчике libyaml (CSafeLoader) и понимает теги `!type:Foo`, которые отвергает yaml.safe_load:
+# такие узлы превращаются в TaggedMapping - обычный словарь с именем типа в поле tag. Простые скаляры остаются
+# строками, как в движке, кроме null, true/false и десятичных целых.
+# При необходимости загрузчик записывает номера строк в компактные таблицы LineTable, не трогая сами данные.
+
+import array
+import re
+import typing
+
+import yaml
+
+_BaseLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+TYPE_TAG_PREFIX = '!type:'
+# Ключ, под которым тег сохраняется при сериализации в JSON
+TYPE_TAG_KEY = '!type'
+
+
+class TaggedMapping(dict):
+    __slots__ = ('tag',)
+
+    def __init__(self, tag, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tag = tag
+
+    def __repr__(self):
+        return f'!type:{self.tag} {dict.__repr__(self)}'
+
+    def __reduce__(self):
+        return TaggedMapping, (self.tag, dict(self))
+
+
+class LineTable:
+    def __init__(self):
+        # id объекта -> номер строки начала узла
+        self.lines: typing.Dict[int, int] = {}
+        # id словаря -> номера строк ключей в порядке ключей словаря
+        self.key_lines: typing.Dict[int, array.array] = {}
+        # Ссылки держат объекты живыми, чтобы их id не переиспользовались
+        self.objects = []
+
+    def add(self, obj, node):
+        self.lines[id(obj)] = node.start_mark.line + 1
+        self.objects.append(obj)
+
+    def add_keys(self, mapping, node):
+        seen = set()
+        lines = array.array('I')
+        for key_node, _ in node.value:
+            key = key_node.value if isinstance(key_node, yaml.ScalarNode) else id(key_node)
+            if key in seen:
+                continue
+            seen.add(key)
+            lines.append(key_node.start_mark.line + 1)
+        self.key_lines[id(mapping)] = lines
+
+    def get_line(self, obj) -> typing.Optional[int]:
+        return self.lines.get(id(obj))
+
+    def get_key_line(self, mapping, key) -> typing.Optional[int]:
+        lines = self.key_lines.get(id(mapping))
+        if lines is None:
+            return None
+        for idx, mapping_key in enumerate(mapping):
+            if mapping_key == key:
+                return lines[idx] if idx < len(lines) else None
+        return None
+
+
+class PrototypeLoader(_BaseLoader):
+    pass
+
+
+# YAML 1.1 распознаёт в простых скалярах on/off/yes/no, 0x10, 010, 1_000, 1:30, даты и т.п., а движок (YamlDotNet)
+# читает их как строки: иначе `id: On` превратился бы в True, а `0x10` - в 16.
+# Поэтому оставлены только нужные резолверы: null, true/false и десятичные целые без ведущих нулей (uid на картах)
+PrototypeLoader.yaml_implicit_resolvers = {
+    first_char: [(tag, regexp) for tag, regexp in resolvers if tag == 'tag:yaml.org,2002:null']
+    for first_char, resolvers in _BaseLoader.yaml_implicit_resolvers.items()
+}
+PrototypeLoader.add_implicit_resolver('tag:yaml.org,2002:bool', re.compile(r'^(?:true|True|TRUE|false|False|FALSE)$'),
+                                      list('tTfF'))
+PrototypeLoader.add_implicit_resolver('tag:yaml.org,2002:int', re.compile(r'^(?:0|-?[1-9][0-9]*)$'),
+                                      list('-0123456789'))
+
+
+def _construct_type_tag(loader, tag_suffix, node):
+    data = TaggedMapping(tag_suffix)
+    yield data
+    # `- !type:Foo` без полей - пустой скаляр, `!type:Foo {}` - пустой словарь
+    if isinstance(node, yaml.MappingNode):
+        data.update(loader.construct_mapping(node, deep=True))
+        line_table = getattr(loader, 'line_table', None)
+        if line_table is not None:
+            line_table.add(data, node)
+            line_table.add_keys(data, node)
+
+
+PrototypeLoader.add_multi_constructor(TYPE_TAG_PREFIX, _construct_type_tag)
+
+
+class LineTrackingLoader(PrototypeLoader):
+    def __init__(self, stream):
+        super().__init__(stream)
+        self.line_table = LineTable()
+
+
+def _construct_map_with_lines(loader, node):
+    data = {}
+    yield data
+    data.update(loader.construct_mapping(node, deep=True))
+    loader.line_table.add(data, node)
+    loader.line_table.add_keys(data, node)
+
+
+def _construct_seq_with_lines(loader, node):
+    data = []
+    yield data
+    data.extend(loader.construct_sequence(node, deep=True))
+    loader.line_table.add(data, node)
+
+
+LineTrackingLoader.add_constructor('tag:yaml.org,2002:map', _construct_map_with_lines)
+LineTrackingLoader.add_constructor('tag:yaml.org,2002:seq', _construct_seq_with_lines)
+
+
+def load(data: typing.Union[str, bytes]):
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+    return yaml.load(data, Loader=PrototypeLoader)
+
+
+def load_with_lines(data: typing.Union[str, bytes]) -> typing.Tuple[typing.Any, LineTable]:
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+    loader = LineTrackingLoader(data)
+    try:
+        return loader.get_single_data(), loader.line_table
+    finally:
+        loader.dispose()
+
+
+def load_file(path, with_lines=False):
+    with open(path, 'rb') as file:
+        raw_data = file.read()
+    return load_with_lines(raw_data) if with_lines else load(raw_data)
+
+
+# Текстовые поля (name, description, suffix) приводятся к строке так, как они записаны в YAML движка
+def scalar_to_str(value) -> typing.Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def to_plain(value):
+    # TaggedMapping сериализуется в JSON как словарь с ключом '!type'
+    if isinstance(value, TaggedMapping):
+        plain = {TYPE_TAG_KEY: value.tag}
+        for key, item in value.items():
+            plain[key] = to_plain(item)
+        return plain
+    if isinstance(value, dict):
+        return {key: to_plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_plain(item) for item in value]
+    return value
+
+
+def from_plain_hook(mapping: dict):
+    # object_hook для json.loads, обратный to_plain
+    if TYPE_TAG_KEY in mapping:
+        tag = mapping.pop(TYPE_TAG_KEY)
+        return TaggedMapping(tag, mapping)
+    return mapping
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+# Тесты сбора ссылок на текстуры из прототипов (texturecheck.py).
+# Запуск: python -m unittest test_texturecheck (из Tools/_sunrise/prototypes)
+
+import os
+import tempfile
+import unittest
+
+from protoindex import PrototypeIndex
+from texturecheck import build_prototype_reference_index, collect_sprite_references
+
+PROTOTYPES = '''
+- type: entity
+  id: TestHatBase
+  abstract: true
+  components:
+  - type: Sprite
+    sprite: Clothing/Head/Hats/beanie.rsi
+    state: icon
+
+- type: entity
+  parent: TestHatBase
+  id: TestHatLayered
+  components:
+  - type: Sprite
+    sprite: Clothing/Head/Hats/canada_beanie.rsi
+    layers:
+    - state: icon_base
+    - state: icon_leaf
+'''
+
+
+class SpriteReferencesTest(unittest.TestCase):
+    def test_state_without_layers(self):
+        references = collect_sprite_references({'type': 'Sprite', 'sprite': 'Objects/mug.rsi', 'state': 'icon'})
+        self.assertEqual(references, {('Objects/mug.rsi', None), ('Objects/mug.rsi', 'icon')})
+
+    def test_state_ignored_with_layers(self):
+        references = collect_sprite_references({
+            'type': 'Sprite',
+            'sprite': 'Objects/mug.rsi',
+            'state': 'icon',
+            'layers': [{'state': 'base'}, {'sprite': 'Objects/fill.rsi', 'state': 'fill'}],
+        })
+        self.assertEqual(references, {('Objects/mug.rsi', None), ('Objects/mug.rsi', 'base'),
+                                      ('Objects/fill.rsi', None), ('Objects/fill.rsi', 'fill')})
+
+    def test_inherited_state_ignored_with_child_layers(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            prototypes_dir_path = os.path.join(tmp_dir, 'Prototypes')
+            os.makedirs(prototypes_dir_path)
+            with open(os.path.join(prototypes_dir_path, 'hats.yml'), 'w', encoding='utf8') as file:
+                file.write(PROTOTYPES)
+
+            index = PrototypeIndex(os.path.join(tmp_dir, 'prototypes.db'), prototypes_dir_path)
+            try:
+                index.update(jobs=1)
+                references = build_prototype_reference_index(index)
+            finally:
+                index.close()
+
+        child_references = {reference for reference, locations in references.items()
+                            if any(location.prototype_id == 'TestHatLayered' for location in locations)}
+        self.assertEqual(child_references, {
+            ('Clothing/Head/Hats/canada_beanie.rsi', None),
+            ('Clothing/Head/Hats/canada_beanie.rsi', 'icon_base'),
+            ('Clothing/Head/Hats/canada_beanie.rsi', 'icon_leaf'),
+        })
+        # У базы без layers собственный state по-прежнему учитывается
+        self.assertIn(('Clothing/Head/Hats/beanie.rsi', 'icon'), references)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+
+# Поиск отсутствующих и неиспользуемых текстур.
+# Строит индекс всех (rsi, state) по meta.json в Resources/Textures и индекс ссылок на них из прототипов
+# (с учётом унаследованных спрайтов), после чего сообщает:
+#   - ссылки на несуществующие RSI и состояния;
+#   - RSI, на которые не ссылается ни один прототип и ни один файл .cs/.xaml;
+#   - состояния используемых RSI, на которые ничего не ссылается (кроме состояний, которые движок выбирает сам).
+
+import argparse
+import json
+import logging
+import os
+import pathlib
+import re
+import sys
+import typing
+
+from protoindex import PrototypeIndex, BASE_DIR_PATH
+from protoinherit import InheritanceResolver
+
+TEXTURES_DIR_PATH = os.path.join(BASE_DIR_PATH, 'Resources', 'Textures')
+
+# Состояния, которые выбираются кодом/визуализаторами по имени и не указываются в прототипах явно
+IMPLICIT_STATE_PATTERNS = re.compile(
+    r'^(icon|icon-.*|inhand-(left|right)|wielded-inhand-(left|right)|equipped-.*|.*-equipped-.*|'
+    r'.*-inhand-(left|right)|open|closed|base|.*_open|.*_closed)$'
+)
+CODE_RSI_PATTERN = re.compile(r'(?:/?Textures/)?([\w\-./]+?\.rsi)\b')
+CODE_EXTENSIONS = ('.cs', '.xaml')
+
+SpriteReference = typing.Tuple[str, typing.Optional[str]]
+
+
+class ReferenceLocation(typing.NamedTuple):
+    prototype_kind: str
+    prototype_id: str
+    file: str
+    line: int
+    abstract: bool
+
+
+def normalize_rsi_path(path) -> typing.Optional[str]:
+    if not isinstance(path, str) or not path.endswith('.rsi'):
+        return None
+    path = path.strip().lstrip('/')
+    if path.startswith('Textures/'):
+        path = path[len('Textures/'):]
+    return path
+
+
+def build_rsi_index(textures_dir_path=TEXTURES_DIR_PATH) -> typing.Dict[str, typing.Set[str]]:
+    rsi_states = {}
+    for meta_path in pathlib.Path(textures_dir_path).rglob('*.rsi/meta.json'):
+        rsi_path = meta_path.parent.relative_to(textures_dir_path).as_posix()
+        try:
+            with open(meta_path, 'r', encoding='utf-8-sig') as file:
+                meta = json.load(file)
+            rsi_states[rsi_path] = {state['name'] for state in meta.get('states', [])}
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f'Не удалось прочитать {meta_path}: {e}')
+            rsi_states[rsi_path] = set()
+    return rsi_states
+
+
+# Обходит данные прототипа, запоминая ближайший sprite/rsi выше по дереву: так слои Sprite без своего sprite
+# получают RSI компонента. Возвращает пары (rsi, state), state = None для ссылки на RSI целиком.
+# Если у узла есть layers, движок не смотрит на его собственный state (он мог остаться от родителя)
+def collect_sprite_references(value, rsi=None, references=None) -> typing.Set[SpriteReference]:
+    if references is None:
+        references = set()
+
+    if isinstance(value, dict):
+        own_rsi = normalize_rsi_path(value.get('sprite')) or normalize_rsi_path(value.get('rsi'))
+        if own_rsi:
+            rsi = own_rsi
+            references.add((rsi, None))
+
+        state = value.get('state')
+        if rsi and isinstance(state, str) and not value.get('layers'):
+            references.add((rsi, state))
+
+        for key, item in value.items():
+            if isinstance(item, (dict, list)):
+                collect_sprite_references(item, rsi, references)
+    elif isinstance(value, list):
+        for item in value:
+            collect_sprite_references(item, rsi, references)
+
+    return references
+
+
+def build_prototype_reference_index(index: PrototypeIndex) -> typing.Dict[SpriteReference, typing.List[ReferenceLocation]]:
+    entity_resolver = InheritanceResolver(index, 'entity')
+    entity_resolver.resolve_all()
+
+    references: typing.Dict[SpriteReference, typing.List[ReferenceLocation]] = {}
+    for record in index.get_all():
+        data = entity_resolver.resolved.get(record.id) if record.kind == 'entity' else record.data
+        location = ReferenceLocation(record.kind, record.id, record.file, record.line, record.abstract)
+        for reference in collect_sprite_references(data):
+            references.setdefault(reference, []).append(location)
+
+    return references
+
+
+def build_code_reference_index(base_dir_path=BASE_DIR_PATH) -> typing.Set[str]:
+    rsi_paths = set()
+    for project_dir in sorted(pathlib.Path(base_dir_path).glob('Content.*')):
+        for root, _, filenames in os.walk(project_dir):
+            for filename in filenames:
+                if not filename.endswith(CODE_EXTENSIONS):
+                    continue
+                with open(os.path.join(root, filename), 'r', encoding='utf-8-sig', errors='ignore') as file:
+                    content = file.read()
+                if '.rsi' not in content:
+                    continue
+                for match in CODE_RSI_PATTERN.finditer(content):
+                    rsi_paths.add(normalize_rsi_path(match.group(1)))
+    return rsi_paths
+
+
+class TextureReport:
+    def __init__(self):
+        self.missing_rsis: typing.Dict[str, typing.List[ReferenceLocation]] = {}
+        self.missing_states: typing.Dict[SpriteReference, typing.List[ReferenceLocation]] = {}
+        self.unused_rsis: typing.List[str] = []
+        self.unused_states: typing.Dict[str, typing.List[str]] = {}
+
+
+def check_textures(rsi_states, prototype_references, code_references) -> TextureReport:
+    report = TextureReport()
+    referenced_states: typing.Dict[str, typing.Set[str]] = {}
+
+    for (rsi, state), locations in prototype_references.items():
+        referenced_states.setdefault(rsi, set())
+        if state is not None:
+            referenced_states[rsi].add(state)
+
+        # Абстрактные базы могут ссылаться на текстуры, которые потомки всё равно переопределяют
+        concrete_locations = [location for location in locations if not location.abstract]
+        if not concrete_locations:
+            continue
+
+        if rsi not in rsi_states:
+            report.missing_rsis.setdefault(rsi, []).extend(concrete_locations)
+        elif state is not None and state not in rsi_states[rsi]:
+            report.missing_states[(rsi, state)] = concrete_locations
+
+    for rsi in sorted(rsi_states):
+        if rsi not in referenced_states and rsi not in code_references:
+            report.unused_rsis.append(rsi)
+            continue
+
+        # RSI из кода используются целиком: код выбирает состояния сам
+        if rsi in code_references:
+            continue
+
+        unused = sorted(state for state in rsi_states[rsi]
+                        if state not in referenced_states.get(rsi, ()) and not IMPLICIT_STATE_PATTERNS.match(state))
+        if unused:
+            report.unused_states[rsi] = unused
+
+    return report
+
+
+def print_report(report: TextureReport, show_unused_states):
+    for rsi, locations in sorted(report.missing_rsis.items()):
+        location = locations[0]
+        print(f'Resources/Prototypes/{location.file}:{location.line}: {location.prototype_id} ссылается на несуществующий RSI {rsi}')
+
+    for (rsi, state), locations in sorted(report.missing_states.items()):
+        location = locations[0]
+        print(f'Resources/Prototypes/{location.file}:{location.line}: {location.prototype_id} ссылается на несуществующее состояние {rsi}:{state}')
+
+    for rsi in report.unused_rsis:
+        print(f'Неиспользуемый RSI: {rsi}')
+
+    if show_unused_states:
+        for rsi, states in sorted(report.unused_states.items()):
+            print(f'Неиспользуемые состояния {rsi}: {", ".join(states)}')
+
+    print(f'Отсутствующих RSI: {len(report.missing_rsis)}, отсутствующих состояний: {len(report.missing_states)}, '
+          f'неиспользуемых RSI: {len(report.unused_rsis)}, RSI с неиспользуемыми состояниями: {len(report.unused_states)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Поиск отсутствующих и неиспользуемых текстур')
+    parser.add_argument('--textures', default=TEXTURES_DIR_PATH, help='Каталог текстур')
+    parser.add_argument('--no-code', action='store_true', help='Не искать ссылки на RSI в файлах .cs/.xaml')
+    parser.add_argument('--unused-states', action='store_true', help='Выводить неиспользуемые состояния по каждому RSI')
+    parser.add_argument('--json', metavar='FILE', help='Записать отчёт в JSON')
+    parser.add_argument('--strict', action='store_true', help='Завершиться с ошибкой, если есть отсутствующие текстуры')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    index = PrototypeIndex()
+    index.update()
+
+    rsi_states = build_rsi_index(args.textures)
+    prototype_references = build_prototype_reference_index(index)
+    code_references = set() if args.no_code else build_code_reference_index()
+    index.close()
+
+    report = check_textures(rsi_states, prototype_references, code_references)
+    print_report(report, args.unused_states)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf8') as file:
+            json.dump({
+                'missing_rsis': {rsi: [location._asdict() for location in locations]
+                                 for rsi, locations in report.missing_rsis.items()},
+                'missing_states': [{'rsi': rsi, 'state': state, 'references': [location._asdict() for location in locations]}
+                                   for (rsi, state), locations in report.missing_states.items()],
+                'unused_rsis': report.unused_rsis,
+                'unused_states': report.unused_states,
+            }, file, ensure_ascii=False, indent=1)
+
+    if args.strict and (report.missing_rsis or report.missing_states):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())